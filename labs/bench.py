@@ -0,0 +1,128 @@
+import argparse
+import json
+import statistics
+import sys
+import tracemalloc
+from time import perf_counter_ns
+
+
+# Реестр замеров: имя -> (функция, которая возвращает замеряемую функцию, аргументы).
+# Модули лаб подгружаются только при запуске замера, чтобы импорт bench
+# не тянул за собой lab6 с его графиками.
+BENCHMARKS = {}
+
+
+def register(name, loader, *args):
+    BENCHMARKS[name] = (loader, args)
+
+
+def _from(module, func):
+    def loader():
+        return getattr(__import__(module), func)
+    return loader
+
+
+register("recursive_distribution", _from("lab5", "recursive_distribution"), 10, 5)
+register("functional_distribution", _from("lab5", "functional_distribution"), 10, 5)
+register("find_optimal_distribution", _from("lab5", "find_optimal_distribution"), 8, 4, 1, 3)
+register("F_rec", _from("lab6", "F_rec"), 15)
+register("F_it", _from("lab6", "F_it"), 500)
+
+
+def percentile(sorted_values, q):
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def measure(func, *args, warmup=3, repeat=20, memory=True):
+    for _ in range(warmup):
+        func(*args)
+
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter_ns()
+        func(*args)
+        timings.append(perf_counter_ns() - start)
+    timings.sort()
+
+    # Память меряется отдельным прогоном: под tracemalloc код заметно медленнее
+    peak = None
+    if memory:
+        tracemalloc.start()
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "repeat": repeat,
+        "min_ns": timings[0],
+        "median_ns": int(statistics.median(timings)),
+        "p95_ns": percentile(timings, 0.95),
+        "peak_bytes": peak,
+    }
+
+
+def run_all(names=None, warmup=3, repeat=20):
+    results = {}
+    for name in names or BENCHMARKS:
+        loader, args = BENCHMARKS[name]
+        result = measure(loader(), *args, warmup=warmup, repeat=repeat)
+        result["args"] = list(args)
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, threshold=0.10):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or base.get("args") != result["args"]:
+            continue
+        ratio = result["median_ns"] / base["median_ns"]
+        if ratio > 1 + threshold:
+            regressions.append((name, base["median_ns"], result["median_ns"], ratio))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'Функция':<28} {'медиана (мкс)':>14} {'p95 (мкс)':>12} {'пик памяти (КБ)':>16}")
+    for name, r in results.items():
+        peak = "-" if r["peak_bytes"] is None else f"{r['peak_bytes'] / 1024:.1f}"
+        print(f"{name:<28} {r['median_ns'] / 1000:>14.1f} {r['p95_ns'] / 1000:>12.1f} {peak:>16}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры функций из лабораторных 5 и 6")
+    parser.add_argument("names", nargs="*", help="какие функции мерить (по умолчанию все)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="куда записать результаты")
+    parser.add_argument("--baseline", help="JSON с прошлыми результатами для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="допустимый рост медианы, доля (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(unknown)}")
+
+    results = run_all(args.names, args.warmup, args.repeat)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, ratio in regressions:
+            print(f"Регрессия {name}: {old / 1000:.1f} -> {new / 1000:.1f} мкс (x{ratio:.2f})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
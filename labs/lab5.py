@@ -1,5 +1,13 @@
+import heapq
+import json
+import os
+import sys
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from itertools import product
-from datetime import datetime
+from math import comb
+from time import perf_counter, perf_counter_ns
 
 
 # Часть 1: Распределение предметов
@@ -21,6 +29,92 @@ def functional_distribution(T, K):
     return [p for p in product(range(T + 1), repeat=K) if sum(p) == T]
 
 
+# Ленивые версии: композиции выдаются по одной в том же порядке, что у
+# recursive_distribution и functional_distribution. Следующая композиция
+# получается из текущей на месте, без копий списка на каждом уровне.
+def iter_distribution(T, K):
+    if K <= 0:
+        if T == 0:
+            yield ()
+        return
+    current = [0] * K
+    current[-1] = T
+    last = K - 1
+    while True:
+        yield tuple(current)
+        if current[last] > 0:
+            if K == 1:
+                return
+            current[last - 1] += 1
+            current[last] -= 1
+            continue
+        # последний ноль: ищем самую правую ненулевую позицию до него
+        j = last - 1
+        while j >= 0 and current[j] == 0:
+            j -= 1
+        if j <= 0:
+            return
+        current[j - 1] += 1
+        current[last] = current[j] - 1
+        current[j] = 0
+
+
+# Те же композиции пачками по chunk_size строк в виде массивов NumPy
+def iter_distribution_chunks(T, K, chunk_size=65536):
+    import numpy as np
+
+    chunk = []
+    for composition in iter_distribution(T, K):
+        chunk.append(composition)
+        if len(chunk) == chunk_size:
+            yield np.array(chunk, dtype=np.int64).reshape(-1, K)
+            chunk = []
+    if chunk:
+        yield np.array(chunk, dtype=np.int64).reshape(-1, K)
+
+
+# Произвольный доступ к композициям в лексикографическом порядке (том же,
+# что у recursive_distribution): номер i-й композиции и обратно без перебора
+# предыдущих. Композиций T в K слагаемых (с нулями) comb(T + K - 1, K - 1).
+def composition_count(T, K):
+    if K <= 0:
+        return 1 if T == 0 else 0
+    return comb(T + K - 1, K - 1)
+
+
+def composition_unrank(T, K, index):
+    if not 0 <= index < composition_count(T, K):
+        raise IndexError("номер композиции вне диапазона")
+    result = []
+    remaining = T
+    for j in range(K - 1):
+        parts_left = K - j - 1
+        items = 0
+        while True:
+            block = composition_count(remaining - items, parts_left)
+            if index < block:
+                break
+            index -= block
+            items += 1
+        result.append(items)
+        remaining -= items
+    if K:
+        result.append(remaining)
+    return tuple(result)
+
+
+def composition_rank(composition):
+    K = len(composition)
+    remaining = sum(composition)
+    index = 0
+    for j, items in enumerate(composition[:-1]):
+        parts_left = K - j - 1
+        for smaller in range(items):
+            index += composition_count(remaining - smaller, parts_left)
+        remaining -= items
+    return index
+
+
 # Часть 2: Оптимальное распределение предметов
 def assign_items_to_people(item_ids, distribution):
     num_people = max(distribution) + 1
@@ -30,83 +124,721 @@ def assign_items_to_people(item_ids, distribution):
     return [sorted(group) for group in people]
 
 
-def find_optimal_distribution(total_items, total_people, min_items=1, max_items=2):
-    distributions = set()
-    roughness_values = []
+# Генератор допустимых распределений без перебора всех K^N шаблонов.
+# Предметы раздаются по порядку, ветки, из которых нельзя выйти на границы
+# min_items/max_items, отсекаются сразу, поэтому каждый лист - готовый ответ,
+# а порядок выдачи совпадает с порядком product(range(K), repeat=N).
+def bounded_partitions(total_items, total_people, min_items=1, max_items=2, prefix=()):
+    lo = max(min_items, 1)
+    hi = max_items
+    if total_people <= 0 or total_people * lo > total_items or total_people * hi < total_items:
+        return
 
     item_ids = list(range(1, total_items + 1))
+    pattern = [-1] * total_items
+    counts = [0] * total_people
+    # need - сколько предметов ещё нужно, чтобы у каждого было хотя бы lo
+    need = total_people * lo
+
+    for pos, person in enumerate(prefix):
+        if counts[person] >= hi:
+            return
+        if counts[person] < lo:
+            need -= 1
+        counts[person] += 1
+        pattern[pos] = person
+    start = len(prefix)
+    if need > total_items - start:
+        return
 
-    for pattern in product(range(total_people), repeat=total_items):
-        used_people = set(pattern)
-        if len(used_people) < total_people:
+    pos = start
+    while pos >= start:
+        if pos == total_items:
+            yield assign_items_to_people(item_ids, pattern)
+            pos -= 1
             continue
 
-        distribution = assign_items_to_people(item_ids, pattern)
+        person = pattern[pos]
+        if person >= 0:
+            counts[person] -= 1
+            if counts[person] < lo:
+                need += 1
 
-        counts = [len(group) for group in distribution]
-        if min(counts) < min_items or max(counts) > max_items:
-            continue
+        remaining = total_items - pos - 1
+        person += 1
+        while person < total_people:
+            c = counts[person]
+            if c < hi and need - (c < lo) <= remaining:
+                break
+            person += 1
 
-        key = tuple(tuple(group) for group in distribution)
-        if key in distributions:
+        if person == total_people:
+            pattern[pos] = -1
+            pos -= 1
             continue
-        distributions.add(key)
 
+        if counts[person] < lo:
+            need -= 1
+        counts[person] += 1
+        pattern[pos] = person
+        pos += 1
+
+
+# Подсчёт распределений без перебора.
+# ways[n] - сколькими способами можно раздать n разных предметов уже
+# рассмотренным людям так, чтобы у каждого было от lo до hi предметов.
+# Очередной человек забирает c предметов из n: comb(n, c) вариантов.
+def count_distributions(total_items, total_people, min_items=1, max_items=2):
+    lo = max(min_items, 1)
+    hi = min(max_items, total_items)
+    if total_people <= 0 or total_people * lo > total_items or total_people * hi < total_items:
+        return 0, None
+
+    ways = [0] * (total_items + 1)
+    ways[0] = 1
+    for k in range(1, total_people + 1):
+        new_ways = [0] * (total_items + 1)
+        for n in range(k * lo, min(k * hi, total_items) + 1):
+            total = 0
+            for c in range(lo, min(hi, n) + 1):
+                if ways[n - c]:
+                    total += comb(n, c) * ways[n - c]
+            new_ways[n] = total
+        ways = new_ways
+
+    # Раз N лежит между K*min и K*max, то и N // K, и ceil(N / K) укладываются
+    # в границы, значит разница 0 или 1 всегда достижима
+    best_roughness = 0 if total_items % total_people == 0 else 1
+    return ways[total_items], best_roughness
+
+
+# То же для распределений из bounded_partitions. Число способов
+# дораздать оставшиеся предметы зависит только от того, сколько уже есть у
+# каждого, поэтому считается той же DP, что и в count_distributions.
+def _completions(counts, remaining, lo, hi):
+    ways = [0] * (remaining + 1)
+    ways[0] = 1
+    for c in counts:
+        need, room = max(lo - c, 0), hi - c
+        if room < need:
+            return 0
+        new_ways = [0] * (remaining + 1)
+        for n in range(remaining + 1):
+            total = 0
+            for j in range(need, min(room, n) + 1):
+                if ways[n - j]:
+                    total += comb(n, j) * ways[n - j]
+            new_ways[n] = total
+        ways = new_ways
+    return ways[remaining]
+
+
+def bounded_partition_unrank(total_items, total_people, min_items, max_items, index):
+    lo = max(min_items, 1)
+    if not 0 <= index < count_distributions(total_items, total_people, min_items, max_items)[0]:
+        raise IndexError("номер распределения вне диапазона")
+    counts = [0] * total_people
+    pattern = []
+    for pos in range(total_items):
+        remaining = total_items - pos - 1
+        for person in range(total_people):
+            if counts[person] >= max_items:
+                continue
+            counts[person] += 1
+            block = _completions(counts, remaining, lo, max_items)
+            if index < block:
+                break
+            index -= block
+            counts[person] -= 1
+        pattern.append(person)
+    return assign_items_to_people(range(1, total_items + 1), pattern)
+
+
+def bounded_partition_rank(distribution, min_items=1, max_items=2):
+    lo = max(min_items, 1)
+    total_people = len(distribution)
+    total_items = sum(len(group) for group in distribution)
+    pattern = [0] * total_items
+    for person, group in enumerate(distribution):
+        for item in group:
+            pattern[item - 1] = person
+
+    counts = [0] * total_people
+    index = 0
+    for pos, person in enumerate(pattern):
+        remaining = total_items - pos - 1
+        for smaller in range(person):
+            if counts[smaller] >= max_items:
+                continue
+            counts[smaller] += 1
+            index += _completions(counts, remaining, lo, max_items)
+            counts[smaller] -= 1
+        counts[person] += 1
+    return index
+
+
+def find_optimal_distribution(total_items, total_people, min_items=1, max_items=2):
+    best = None
+    total = 0
+
+    # Храним только текущий минимум: память не зависит от числа вариантов
+    for distribution in bounded_partitions(total_items, total_people, min_items, max_items):
+        total += 1
+        counts = [len(group) for group in distribution]
+        roughness = max(counts) - min(counts)
+        if best is None or roughness < best[1]:
+            best = (distribution, roughness)
+
+    if best is None:
+        print("Не найдено допустимых распределений.")
+        return [], 0
+
+    return best, total
+
+
+# k лучших распределений по разнице (при равной - в порядке перебора).
+# В куче не больше k элементов, наверху худший из отобранных.
+def top_k_distributions(total_items, total_people, min_items=1, max_items=2, k=10):
+    heap = []
+    for index, distribution in enumerate(bounded_partitions(total_items, total_people, min_items, max_items)):
+        counts = [len(group) for group in distribution]
+        roughness = max(counts) - min(counts)
+        entry = (-roughness, -index, distribution)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return [(distribution, -neg_rough) for neg_rough, _, distribution in sorted(heap, reverse=True)]
+
+
+# Все оптимальные распределения по одному. Оптимум известен заранее: у
+# каждого N // K или ceil(N / K) предметов (см. count_distributions),
+# поэтому генератор сразу получает эти границы и каждый его лист -
+# оптимальное распределение, без перебора и отсева остальных.
+def iter_optimal_distributions(total_items, total_people, min_items=1, max_items=2):
+    _, best_roughness = count_distributions(total_items, total_people, min_items, max_items)
+    if best_roughness is None:
+        return
+    yield from bounded_partitions(total_items, total_people,
+                                  max(min_items, total_items // total_people),
+                                  min(max_items, -(-total_items // total_people)))
+
+
+# Предметы с весами: ищем распределение с наименьшим разбросом суммарного
+# веса между людьми при тех же ограничениях на число предметов.
+# Метод ветвей и границ: предметы идут от тяжёлых к лёгким, начальная
+# оценка - лучшее из жадного LPT (очередной предмет самому лёгкому) и метода
+# разностей Кармаркара-Карпа, доведённое попарными переделами между людьми.
+# Ветка отсекается, если даже в лучшем случае разброс не станет меньше
+# найденного. Люди с одинаковыми (вес, число предметов) взаимозаменяемы,
+# поэтому из них пробуется только первый.
+def _greedy_weighted(order, weights, total_people, lo, hi):
+    loads = [0] * total_people
+    counts = [0] * total_people
+    pattern = [0] * len(weights)
+    for pos, item in enumerate(order):
+        left = len(order) - pos
+        need = sum(max(lo - c, 0) for c in counts)
+        candidates = [p for p in range(total_people) if counts[p] < hi]
+        if need >= left:
+            candidates = [p for p in candidates if counts[p] < lo]
+        if not candidates:
+            return None
+        person = min(candidates, key=lambda p: loads[p])
+        loads[person] += weights[item]
+        counts[person] += 1
+        pattern[item] = person
+    return pattern
+
+
+# Метод разностей Кармаркара-Карпа для k людей. Каждый предмет - набор из
+# k нагрузок (вес, 0, ..., 0); два набора с наибольшим разбросом сливаются
+# в один, самая тяжёлая нагрузка одного с самой лёгкой другого. Для больших
+# весов разброс выходит на порядки меньше, чем у LPT. Число предметов у
+# людей метод не учитывает, поэтому неподходящее деление отбрасывается.
+def _kk_weighted(weights, total_people, lo, hi):
+    heap = []
+    for i, w in enumerate(weights):
+        loads = [(w, (i,))] + [(0, ())] * (total_people - 1)
+        heap.append((-w, i, loads))
+    heapq.heapify(heap)
+    while len(heap) > 1:
+        _, tie, first = heapq.heappop(heap)
+        _, _, second = heapq.heappop(heap)
+        merged = sorted(((a[0] + b[0], a[1] + b[1]) for a, b in zip(first, reversed(second))),
+                        key=lambda e: -e[0])
+        heapq.heappush(heap, (merged[-1][0] - merged[0][0], tie, merged))
+    pattern = [0] * len(weights)
+    for person, (_, items) in enumerate(heap[0][2]):
+        if not lo <= len(items) <= hi:
+            return None
+        for i in items:
+            pattern[i] = person
+    return pattern
+
+
+# Лучшее деление общих предметов двух людей: подмножество для первого
+# с суммой как можно ближе к половине и допустимым числом предметов.
+# Перебор встречей посередине: 2^(m/2) сумм на каждую половину.
+def _split_pair(items, weights, lo, hi):
+    m = len(items)
+    total = sum(weights[i] for i in items)
+    half = m // 2
+    left, right = items[:half], items[half:]
+
+    def subsets(part):
+        result = [(0, 0, ())]
+        for i in part:
+            result += [(c + 1, s + weights[i], chosen + (i,)) for c, s, chosen in result]
+        return result
+
+    by_count = {}
+    for c, s, chosen in subsets(right):
+        by_count.setdefault(c, []).append((s, chosen))
+    for group in by_count.values():
+        group.sort()
+    sums_by_count = {c: [s for s, _ in group] for c, group in by_count.items()}
+
+    c_low, c_high = max(lo, m - hi), min(hi, m - lo)
+    best = None
+    for c, s, chosen in subsets(left):
+        for rc in range(max(c_low - c, 0), c_high - c + 1):
+            group = by_count.get(rc)
+            if not group:
+                continue
+            sums = sums_by_count[rc]
+            k = bisect_left(sums, total / 2 - s)
+            for j in (k - 1, k):
+                if 0 <= j < len(group):
+                    diff = abs(2 * (s + sums[j]) - total)
+                    if best is None or diff < best[0]:
+                        best = (diff, chosen + group[j][1])
+    return best
+
+
+# Деление пары, для которой встреча посередине слишком дорога: полный метод
+# разностей (CKK). Каждое число - разность двух сторон (значение, предметы
+# со знаком плюс, со знаком минус); два наибольших числа либо разводятся по
+# разным сторонам (разность), либо кладутся на одну (сумма). Разность
+# пробуется первой, поэтому первый же лист - решение Кармаркара-Карпа.
+# Ветка отсекается, когда наибольшее число не меньше суммы остальных плюс
+# лучший разброс. Перебор ограничен MAX_CKK_NODES узлами.
+MAX_CKK_NODES = 50000
+
+
+def _split_pair_ckk(items, weights, lo, hi):
+    target = sum(weights[i] for i in items) % 2 if all(float(weights[i]).is_integer() for i in items) else 0
+    best = None
+    nodes = 0
+
+    def search(numbers):
+        nonlocal best, nodes
+        if nodes >= MAX_CKK_NODES or (best is not None and best[0] <= target):
+            return
+        nodes += 1
+        value, plus, minus = numbers[0]
+        if len(numbers) == 1:
+            if lo <= len(plus) <= hi and lo <= len(minus) <= hi and (best is None or value < best[0]):
+                best = (value, plus)
+            return
+        if best is not None and value - sum(n[0] for n in numbers[1:]) >= best[0]:
+            return
+        second = numbers[1]
+        rest = numbers[2:]
+        for merged in ((value - second[0], plus + second[2], minus + second[1]),
+                       (value + second[0], plus + second[1], minus + second[2])):
+            pos = 0
+            while pos < len(rest) and rest[pos][0] > merged[0]:
+                pos += 1
+            search(rest[:pos] + [merged] + rest[pos:])
+
+    search(sorted(((weights[i], (i,), ()) for i in items), key=lambda n: -n[0]))
+    return best
+
+
+# Улучшение начального распределения: пары людей по очереди заново делят
+# свои предметы как можно ровнее, пока хоть одна пара становится ровнее.
+# Пары до MAX_SPLIT_ITEMS предметов делятся встречей посередине, большие -
+# методом CKK, а если он не помог - переносами и обменами.
+MAX_SPLIT_ITEMS = 24
+
+
+def _improve_weighted(pattern, weights, total_people, lo, hi):
+    loads = [0] * total_people
+    for item, person in enumerate(pattern):
+        loads[person] += weights[item]
+
+    improved = True
+    while improved:
+        improved = False
+        for a in range(total_people):
+            for b in range(a + 1, total_people):
+                items = [i for i, p in enumerate(pattern) if p == a or p == b]
+                diff = abs(loads[a] - loads[b])
+                if len(items) <= MAX_SPLIT_ITEMS:
+                    best = _split_pair(items, weights, lo, hi)
+                else:
+                    best = _split_pair_ckk(items, weights, lo, hi)
+                # допуск нужен для дробных весов, иначе ошибки округления
+                # заставляют пару бесконечно перекладывать одно и то же
+                if best is not None and best[0] < diff - 1e-9:
+                    chosen = set(best[1])
+                elif len(items) > MAX_SPLIT_ITEMS:
+                    chosen = _move_or_swap(items, pattern, weights, a, b, diff, lo, hi)
+                    if chosen is None:
+                        continue
+                else:
+                    continue
+                loads[a] = loads[b] = 0
+                for i in items:
+                    pattern[i] = a if i in chosen else b
+                    loads[pattern[i]] += weights[i]
+                improved = True
+    return pattern, max(loads) - min(loads)
+
+
+def _move_or_swap(items, pattern, weights, a, b, diff, lo, hi):
+    side_a = [i for i in items if pattern[i] == a]
+    side_b = [i for i in items if pattern[i] == b]
+    load_a = sum(weights[i] for i in side_a)
+    load_b = sum(weights[i] for i in side_b)
+    candidates = []
+    if len(side_a) > lo and len(side_b) < hi:
+        candidates += [(set(side_a) - {i}, -weights[i]) for i in side_a]
+    if len(side_b) > lo and len(side_a) < hi:
+        candidates += [(set(side_a) | {j}, weights[j]) for j in side_b]
+    candidates += [((set(side_a) - {i}) | {j}, weights[j] - weights[i]) for i in side_a for j in side_b]
+    best = None
+    for chosen, delta in candidates:
+        new_diff = abs(load_a + delta - (load_b - delta))
+        if new_diff < diff - 1e-9 and (best is None or new_diff < best[0]):
+            best = (new_diff, chosen)
+    return None if best is None else best[1]
+
+
+# Без ограничения по времени большие входы могут перебираться очень долго,
+# поэтому по умолчанию перебор идёт не дольше DEFAULT_TIME_LIMIT секунд.
+# Результат - в том же виде, что у find_optimal_distribution:
+# ((группы, разброс), optimal), где optimal - доказано ли, что разброс
+# наименьший. Если время вышло раньше, optimal = False и возвращается
+# лучшее найденное распределение.
+DEFAULT_TIME_LIMIT = 10
+
+
+def find_optimal_weighted_distribution(weights, total_people, min_items=1, max_items=2,
+                                       time_limit=DEFAULT_TIME_LIMIT):
+    total_items = len(weights)
+    lo = max(min_items, 1)
+    hi = max_items
+    if total_people <= 0 or total_people * lo > total_items or total_people * hi < total_items:
+        print("Не найдено допустимых распределений.")
+        return [], False
+
+    order = sorted(range(total_items), key=lambda i: -weights[i])
+    sorted_weights = [weights[i] for i in order]
+    # suffix[pos] - суммарный вес ещё не розданных предметов
+    suffix = [0] * (total_items + 1)
+    for pos in range(total_items - 1, -1, -1):
+        suffix[pos] = suffix[pos + 1] + sorted_weights[pos]
+    # Для целых весов итоговый максимум не меньше ceil(среднего), минимум не
+    # больше floor(среднего), и разброс меньше 0/1 не бывает
+    if all(float(w).is_integer() for w in weights):
+        avg_high = -(-suffix[0] // total_people)
+        avg_low = suffix[0] // total_people
+    else:
+        avg_high = avg_low = suffix[0] / total_people
+    floor_bound = avg_high - avg_low
+
+    best_pattern, best_spread = None, float("inf")
+    for start in (_greedy_weighted(order, weights, total_people, lo, hi),
+                  _kk_weighted(weights, total_people, lo, hi)):
+        if start is not None and best_spread > floor_bound:
+            pattern, spread = _improve_weighted(start, weights, total_people, lo, hi)
+            if spread < best_spread:
+                best_pattern, best_spread = pattern, spread
+
+    # time_limit ограничивает перебор: по истечении возвращается лучшее
+    # найденное, а не доказанно оптимальное распределение
+    deadline = None if time_limit is None else perf_counter() + time_limit
+    nodes = 0
+
+    loads = [0] * total_people
+    counts = [0] * total_people
+    pattern = [0] * total_items
+
+    def search(pos, need):
+        nonlocal best_pattern, best_spread, nodes
+        if best_spread <= floor_bound:
+            return
+        nodes += 1
+        if deadline is not None and nodes % 4096 == 0 and perf_counter() > deadline:
+            raise TimeoutError
+        if pos == total_items:
+            spread = max(loads) - min(loads)
+            if spread < best_spread:
+                best_spread = spread
+                best_pattern = [0] * total_items
+                for p, item in enumerate(order):
+                    best_pattern[item] = pattern[p]
+            return
+
+        remaining = suffix[pos]
+        # Итоговый максимум не меньше текущего и среднего, итоговый минимум
+        # не больше среднего и не больше самого лёгкого плюс всё оставшееся
+        low_max = max(max(loads), avg_high)
+        high_min = min(min(loads) + remaining, avg_low)
+        if low_max - high_min >= best_spread:
+            return
+        # Чтобы разброс стал меньше best_spread, каждого надо дотянуть хотя бы
+        # до low_max - best_spread, а оставшегося веса на это может не хватить
+        floor_load = low_max - best_spread
+        if sum(floor_load - x for x in loads if x < floor_load) >= remaining:
+            return
+
+        left = total_items - pos - 1
+        weight = sorted_weights[pos]
+        tried = set()
+        for person in sorted(range(total_people), key=lambda p: loads[p]):
+            c = counts[person]
+            if c >= hi or (loads[person], c) in tried:
+                continue
+            new_need = need - (c < lo)
+            if new_need > left:
+                continue
+            tried.add((loads[person], c))
+            loads[person] += weight
+            counts[person] += 1
+            pattern[pos] = person
+            search(pos + 1, new_need)
+            loads[person] -= weight
+            counts[person] -= 1
+
+    try:
+        search(0, total_people * lo)
+        optimal = True
+    except TimeoutError:
+        # разброс, равный нижней оценке, оптимален и без полного перебора
+        optimal = best_spread <= floor_bound
+
+    if best_pattern is None:
+        if optimal:
+            print("Не найдено допустимых распределений.")
+        else:
+            print("Допустимое распределение не найдено за отведённое время.")
+        return [], False
+    return (assign_items_to_people(range(1, total_items + 1), best_pattern), best_spread), optimal
+
+
+# Параллельный перебор: пространство делится на шарды по префиксу
+# (кому достались первые несколько предметов), каждый процесс перебирает
+# свой шард и возвращает только локальный минимум и число вариантов.
+def _search_shard(args):
+    total_items, total_people, min_items, max_items, prefix = args
+    best = None
+    count = 0
+    for distribution in bounded_partitions(total_items, total_people, min_items, max_items, prefix):
+        count += 1
+        counts = [len(group) for group in distribution]
         roughness = max(counts) - min(counts)
-        roughness_values.append((distribution, roughness))
+        if best is None or roughness < best[1]:
+            best = (distribution, roughness)
+    return best, count
+
+
+def shard_prefixes(total_items, total_people, max_items=2, min_shards=1):
+    depth = 0
+    while depth < total_items and total_people ** depth < min_shards:
+        depth += 1
+    prefixes = []
+    for prefix in product(range(total_people), repeat=depth):
+        if all(prefix.count(p) <= max_items for p in set(prefix)):
+            prefixes.append(prefix)
+    return prefixes
 
-    if not roughness_values:
+
+def find_optimal_distribution_parallel(total_items, total_people, min_items=1, max_items=2, workers=None):
+    workers = workers or os.cpu_count() or 1
+    prefixes = shard_prefixes(total_items, total_people, max_items, min_shards=workers * 4)
+    tasks = [(total_items, total_people, min_items, max_items, prefix) for prefix in prefixes]
+
+    best = None
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map сохраняет порядок шардов, а он совпадает с порядком
+        # последовательного перебора, поэтому при равной разнице
+        # берётся тот же вариант, что и в find_optimal_distribution
+        for shard_best, count in executor.map(_search_shard, tasks, chunksize=1):
+            total += count
+            if shard_best is not None and (best is None or shard_best[1] < best[1]):
+                best = shard_best
+
+    if best is None:
         print("Не найдено допустимых распределений.")
         return [], 0
 
-    min_roughness = min(r[1] for r in roughness_values)
-    best_options = [r for r in roughness_values if r[1] == min_roughness]
+    return best, total
+
+
+# Кэш результатов find_optimal_distribution: LRU в памяти плюс JSON-файлы
+# на диске, чтобы повторные запросы переживали перезапуск. Версия входит в
+# имя файла: при смене алгоритма старые записи просто перестают находиться
+# и удаляются при следующей чистке.
+CACHE_VERSION = 1
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "labs-distribution")
+
+
+class DistributionCache:
+    def __init__(self, path=CACHE_DIR, max_entries=256, max_disk_bytes=50 * 1024 * 1024,
+                 version=CACHE_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.version = version
+        self.memory = OrderedDict()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"v{self.version}-" + "-".join(map(str, key)) + ".json")
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != self.version:
+            return None
+        best, total = data["result"]
+        value = ((best[0], best[1]), total) if best else ([], 0)
+        os.utime(self._file(key))
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._file(key) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "key": list(key), "result": value}, f)
+            os.replace(tmp, self._file(key))
+            self.evict()
+        except OSError:
+            pass
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        # Записи чужих версий удаляются сразу, остальные - от самых давно
+        # использованных, пока каталог не уложится в max_disk_bytes
+        entries = []
+        for name in os.listdir(self.path):
+            full = os.path.join(self.path, name)
+            if not name.endswith(".json"):
+                continue
+            if not name.startswith(f"v{self.version}-"):
+                os.remove(full)
+                continue
+            st = os.stat(full)
+            entries.append((st.st_mtime, st.st_size, full))
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(full)
+            total -= size
+
+    def clear(self):
+        self.memory.clear()
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.path, name))
+
+
+distribution_cache = DistributionCache()
+
 
-    return best_options[0], len(distributions)
+def cached_find_optimal_distribution(total_items, total_people, min_items=1, max_items=2,
+                                     cache=distribution_cache):
+    key = (total_items, total_people, min_items, max_items)
+    result = cache.get(key)
+    if result is None:
+        result = find_optimal_distribution(total_items, total_people, min_items, max_items)
+        cache.put(key, result)
+    return result
+
+
+def speedup_report(items_range=range(10, 15), total_people=5, min_items=1, max_items=3, workers=None):
+    workers = workers or os.cpu_count() or 1
+    print(f"{'N':<5} {'Последовательно (с)':<22} {f'{workers} процессов (с)':<22} {'Ускорение':<10}")
+    for total_items in items_range:
+        start = perf_counter()
+        serial = find_optimal_distribution(total_items, total_people, min_items, max_items)
+        serial_time = perf_counter() - start
+
+        start = perf_counter()
+        parallel = find_optimal_distribution_parallel(total_items, total_people, min_items, max_items, workers)
+        parallel_time = perf_counter() - start
+
+        assert serial == parallel, "параллельный результат расходится с последовательным"
+        print(f"{total_items:<5} {serial_time:<22.3f} {parallel_time:<22.3f} {serial_time / parallel_time:<10.2f}")
 
 
 def print_execution_time(label, start, end):
-    print(f"{label}: время выполнения = {(end - start).total_seconds():.6f} сек")
-
-
-# Тестирование первой части
-print("Часть 1: Сравнение методов распределения предметов")
-T, K = 3, 3
-
-all_items = list(range(1, T + 1))
-all_combinations = list(product(all_items, repeat=K))
-unique_distributions = [c for c in all_combinations if sorted(c) == all_items]
-
-# Рекурсивный метод
-start = datetime.now()
-rec_dist = recursive_distribution(T, K)
-print_execution_time("Рекурсивный метод", start, datetime.now())
-
-print(f"Рекурсивный метод ({len(unique_distributions)} вариантов):")
-for dist in unique_distributions:
-    print(dist)
-
-#Функциональный метод
-start = datetime.now()
-func_dist = functional_distribution(T, K)
-print_execution_time("Функциональный метод", start, datetime.now())
-
-print(f"\nФункциональный метод ({len(unique_distributions)} вариантов):")
-for dist in unique_distributions:
-    print(dist)
-
-#Тестирование второй части
-print("\nЧасть 2: Оптимальное распределение предметов")
-total_items = 7
-total_people = 4
-
-start = datetime.now()
-result = find_optimal_distribution(total_items, total_people, min_items=1, max_items=2)
-print_execution_time("Оптимальное распределение", start, datetime.now())
-
-if result == ([], 0):
-    print("Невозможно распределить предметы в рамках заданных ограничений.")
-else:
-    (best_dist, roughness), total_dists = result
-    print(f"\nОптимальное распределение:", best_dist)
-    print("Разница в количестве предметов:", roughness)
\ No newline at end of file
+    print(f"{label}: время выполнения = {(end - start) / 1e9:.6f} сек")
+
+
+if __name__ == "__main__":
+    # Тестирование первой части
+    print("Часть 1: Сравнение методов распределения предметов")
+    T, K = 3, 3
+
+    all_items = list(range(1, T + 1))
+    all_combinations = list(product(all_items, repeat=K))
+    unique_distributions = [c for c in all_combinations if sorted(c) == all_items]
+
+    # Рекурсивный метод
+    start = perf_counter_ns()
+    rec_dist = recursive_distribution(T, K)
+    print_execution_time("Рекурсивный метод", start, perf_counter_ns())
+
+    print(f"Рекурсивный метод ({len(unique_distributions)} вариантов):")
+    for dist in unique_distributions:
+        print(dist)
+
+    #Функциональный метод
+    start = perf_counter_ns()
+    func_dist = functional_distribution(T, K)
+    print_execution_time("Функциональный метод", start, perf_counter_ns())
+
+    print(f"\nФункциональный метод ({len(unique_distributions)} вариантов):")
+    for dist in unique_distributions:
+        print(dist)
+
+    #Тестирование второй части
+    print("\nЧасть 2: Оптимальное распределение предметов")
+    total_items = 7
+    total_people = 4
+
+    start = perf_counter_ns()
+    result = find_optimal_distribution(total_items, total_people, min_items=1, max_items=2)
+    print_execution_time("Оптимальное распределение", start, perf_counter_ns())
+
+    if result == ([], 0):
+        print("Невозможно распределить предметы в рамках заданных ограничений.")
+    else:
+        (best_dist, roughness), total_dists = result
+        print(f"\nОптимальное распределение:", best_dist)
+        print("Разница в количестве предметов:", roughness)
+
+    # Замер ускорения параллельного перебора: python lab5.py --speedup
+    if "--speedup" in sys.argv:
+        print("\nЧасть 3: Параллельный перебор")
+        speedup_report()
@@ -1,6 +1,13 @@
-import datetime
+from time import perf_counter
+
+_import_start = perf_counter()
+
+import argparse
+import csv
+import json
 import math
-import matplotlib.pyplot as plt
+
+from bench import measure
 
 # Рекурсия
 def F_rec(n):
@@ -25,15 +32,14 @@ def F_it(n):
 
     prev_F = 1
     prev_G = 1
-    sign = -1
     # Факториал (2*i - 1)!
     fact_val = 1
 
     for i in range(2, n + 1):
-        for k in range(2 * (i - 1) + 1, 2 * i):
+        for k in range(2 * (i - 1), 2 * i):
             fact_val *= k
 
-        sign *= -1
+        sign = -1 if i % 2 == 0 else 1
         curr_G = -prev_F + fact_val
         curr_F = sign * (prev_F - 2 * prev_G)
 
@@ -41,41 +47,268 @@ def F_it(n):
 
     return prev_F
 
-# Измерение времени
-n_values_rec = range(1, 11)
-n_values_it = range(1, 21)
-
-rec_time = []
-it_time = []
-
-# Замер рекурсии
-for n in n_values_rec:
-    start = datetime.datetime.now()
-    F_rec(n)
-    duration = (datetime.datetime.now() - start).total_seconds()
-    rec_time.append(duration)
-
-# Замер итерации
-for n in n_values_it:
-    start = datetime.datetime.now()
-    F_it(n)
-    duration = (datetime.datetime.now() - start).total_seconds()
-    it_time.append(duration)
-
-# Таблица результатов
-print(f"{'n':<5} {'Рекурсия (с)':<15} {'Итерация (с)':<15}")
-for n, rt, it in zip(n_values_rec, rec_time, it_time[:len(n_values_rec)]):
-    print(f"{n:<5} {rt:<15.6f} {it:<15.6f}")
-
-plt.figure(figsize=(10, 6))
-plt.plot(n_values_rec, rec_time, label='Рекурсия', marker='o')
-plt.plot(n_values_it, it_time, label='Итерация', marker='x')
-
-plt.title('Сравнение времени выполнения рекурсии и итерации')
-plt.xlabel('n')
-plt.ylabel('Время (секунды)')
-plt.legend()
-plt.grid(True)
-plt.ylim(0, max(it_time) * 1.1)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+# Последовательность целиком: F(1..n) и G(1..n) за один проход без рекурсии.
+# Значения хранятся в общем кэше, следующий запрос продолжает с места,
+# где остановился предыдущий. Факториал (2i - 1)! домножается на два
+# множителя за шаг, как в F_it.
+class FGSequence:
+    def __init__(self):
+        self.F = [None, 1]
+        self.G = [None, 1]
+        self.fact = 1  # (2 * last - 1)!
+
+    def extend(self, n):
+        F, G = self.F, self.G
+        for i in range(len(F), n + 1):
+            self.fact *= (2 * i - 2) * (2 * i - 1)
+            sign = -1 if i % 2 == 0 else 1
+            F.append(sign * (F[i - 1] - 2 * G[i - 1]))
+            G.append(-F[i - 1] + self.fact)
+
+    def values_up_to(self, n):
+        self.extend(n)
+        return self.F[1:n + 1], self.G[1:n + 1]
+
+    def f(self, n):
+        self.extend(n)
+        return self.F[n]
+
+    def g(self, n):
+        self.extend(n)
+        return self.G[n]
+
+
+sequence = FGSequence()
+
+
+def F_seq(n):
+    return sequence.f(n)
+
+
+def G_seq(n):
+    return sequence.g(n)
+
+
+def values_up_to(n):
+    return sequence.values_up_to(n)
+
+
+# Для графиков до n ~ 10^5 хранить все значения нельзя (F(n) растёт как
+# (2n - 1)!), поэтому здесь один проход без кэша: для каждого n из
+# n_values записывается время, за которое проход дошёл до F(n).
+def sequence_times(n_values):
+    wanted = sorted(set(n_values))
+    times = {}
+    start = perf_counter()
+    prev_F, prev_G, fact = 1, 1, 1
+    i = 1
+    for n in wanted:
+        while i < n:
+            i += 1
+            fact *= (2 * i - 2) * (2 * i - 1)
+            sign = -1 if i % 2 == 0 else 1
+            prev_F, prev_G = sign * (prev_F - 2 * prev_G), -prev_F + fact
+        times[n] = perf_counter() - start
+    return [times[n] for n in n_values]
+
+
+# Режимы для огромных n, где точные числа уже не помещаются.
+# F(n) по модулю p: те же шаги, что в F_it, но все числа меньше p.
+def F_mod(n, p):
+    F, G, fact = 1 % p, 1 % p, 1
+    for i in range(2, n + 1):
+        fact = fact * (2 * i - 2) % p * (2 * i - 1) % p
+        sign = -1 if i % 2 == 0 else 1
+        F, G = sign * (F - 2 * G) % p, (-F + fact) % p
+    return F
+
+
+# Для оценки величины F и G делятся на (2i - 1)!: f = F / (2i - 1)!,
+# g = G / (2i - 1)!. Тогда g стремится к 1, f к нулю, вычитания больших
+# близких чисел не бывает, и float не переполняется при любом n.
+def _normalized(n):
+    f, g = 1.0, 1.0
+    for i in range(2, n + 1):
+        r = (2 * i - 2) * (2 * i - 1)
+        sign = -1 if i % 2 == 0 else 1
+        f, g = sign * (f - 2 * g) / r, 1.0 - f / r
+    return f
+
+
+def F_sign(n):
+    f = _normalized(n)
+    return (f > 0) - (f < 0)
+
+
+# log10 |F(n)|: log10 |f| плюс log10 (2n - 1)! через lgamma
+def F_log10(n):
+    f = _normalized(n)
+    if f == 0:
+        return float("-inf")
+    return math.log10(abs(f)) + math.lgamma(2 * n) / math.log(10)
+
+
+# F(n) в виде (мантисса, порядок): F(n) ~ мантисса * 10 ** порядок
+def F_approx(n):
+    f = _normalized(n)
+    if f == 0:
+        return 0.0, 0
+    log_abs = F_log10(n)
+    exponent = math.floor(log_abs)
+    mantissa = math.copysign(10 ** (log_abs - exponent), f)
+    return mantissa, exponent
+
+
+# Сверка быстрых режимов с точными значениями для небольших n
+def verify_modes(n_max=300, moduli=(7, 998244353, 10 ** 9 + 7)):
+    exact, _ = values_up_to(n_max)
+    for n, value in enumerate(exact, start=1):
+        for p in moduli:
+            assert F_mod(n, p) == value % p, f"F_mod расходится при n={n}, p={p}"
+        assert F_sign(n) == (value > 0) - (value < 0), f"F_sign расходится при n={n}"
+        log_exact = math.log10(abs(value))
+        assert abs(F_log10(n) - log_exact) <= 1e-9 * max(1.0, log_exact), f"F_log10 расходится при n={n}"
+    return True
+
+
+# Сколько занял импорт самого модуля (без matplotlib)
+MODULE_IMPORT_S = perf_counter() - _import_start
+
+
+# Редкая сетка n для одного прохода: seq_points значений от 1 до max_seq,
+# равномерно по логарифмической шкале
+def sparse_grid(max_seq, seq_points=30):
+    if seq_points < 2:
+        return [max_seq]
+    return sorted({max(1, round(max_seq ** (k / (seq_points - 1)))) for k in range(seq_points)})
+
+
+# Таблица замеров: для каждого n до max(max_rec, max_it) время рекурсии
+# (до max_rec), итерации (до max_it) и одного прохода FGSequence. Один
+# проход дополнительно меряется на редкой сетке до max_seq: F_it там не
+# запускается, поэтому n ~ 10^5 достижимо. Matplotlib здесь не нужен.
+def collect_timings(max_rec=10, max_it=20, max_seq=None, seq_points=30):
+    dense = max(max_rec, max_it)
+    n_values = set(range(1, dense + 1))
+    if max_seq is not None and max_seq > dense:
+        n_values.update(sparse_grid(max_seq, seq_points))
+    n_values = sorted(n_values)
+    seq_time = sequence_times(n_values)
+    rows = []
+    for n, st in zip(n_values, seq_time):
+        rows.append({
+            "n": n,
+            # Измерение времени: медиана нескольких замеров perf_counter_ns
+            "rec_s": measure(F_rec, n, warmup=1, repeat=5, memory=False)["median_ns"] / 1e9 if n <= max_rec else None,
+            "it_s": measure(F_it, n, warmup=1, repeat=5, memory=False)["median_ns"] / 1e9 if n <= max_it else None,
+            "seq_s": st,
+        })
+    return rows
+
+
+def print_timings(rows):
+    print(f"{'n':<5} {'Рекурсия (с)':<15} {'Итерация (с)':<15}")
+    for row in rows:
+        if row["rec_s"] is not None and row["it_s"] is not None:
+            print(f"{row['n']:<5} {row['rec_s']:<15.6f} {row['it_s']:<15.6f}")
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["n", "rec_s", "it_s", "seq_s"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows, path, extra=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"timings": rows, **(extra or {})}, f, ensure_ascii=False, indent=2)
+
+
+# matplotlib подгружается только когда нужен график. Без окна (headless)
+# включается Agg, который умеет только писать файлы и не требует дисплея.
+def load_pyplot(headless):
+    start = perf_counter()
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt, perf_counter() - start
+
+
+def plot_timings(rows, path=None):
+    plt, import_time = load_pyplot(headless=path is not None)
+    print(f"Импорт matplotlib: {import_time:.3f} с")
+
+    rec = [(r["n"], r["rec_s"]) for r in rows if r["rec_s"] is not None]
+    it = [(r["n"], r["it_s"]) for r in rows if r["it_s"] is not None]
+    dense = max(n for n, _ in rec + it)
+    seq = [(r["n"], r["seq_s"]) for r in rows if r["seq_s"] is not None]
+    # Если один проход мерили дальше итерации, он рисуется справа отдельно:
+    # на общей оси n до 10^5 первые 20 точек слились бы в одну
+    far = [(n, t) for n, t in seq if n > dense]
+
+    plt.figure(figsize=(16 if far else 10, 6))
+    if far:
+        plt.subplot(1, 2, 1)
+    plt.plot(*zip(*rec), label='Рекурсия', marker='o')
+    plt.plot(*zip(*it), label='Итерация', marker='x')
+    plt.plot(*zip(*[(n, t) for n, t in seq if n <= dense]), label='Последовательность (один проход)', marker='.')
+
+    plt.title('Сравнение времени выполнения рекурсии и итерации')
+    plt.xlabel('n')
+    plt.ylabel('Время (секунды)')
+    plt.legend()
+    plt.grid(True)
+    plt.ylim(0, max(t for _, t in it) * 1.1)
+    if far:
+        plt.subplot(1, 2, 2)
+        plt.plot(*zip(*seq), label='Последовательность (один проход)', marker='.')
+        plt.xscale('log')
+        plt.title('Один проход на больших n')
+        plt.xlabel('n')
+        plt.ylabel('Время (секунды)')
+        plt.legend()
+        plt.grid(True)
+    plt.tight_layout()
+    if path is None:
+        plt.show()
+    else:
+        plt.savefig(path)
+        plt.close()
+    return import_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер F(n): рекурсия, итерация, один проход")
+    parser.add_argument("--max-rec", type=int, default=10, help="до какого n мерить рекурсию")
+    parser.add_argument("--max-it", type=int, default=20, help="до какого n мерить итерацию")
+    parser.add_argument("--max-seq", type=int, help="до какого n мерить один проход (редкая сетка)")
+    parser.add_argument("--seq-points", type=int, default=30, help="сколько точек в редкой сетке")
+    parser.add_argument("--csv", help="записать таблицу замеров в CSV")
+    parser.add_argument("--json", help="записать таблицу замеров в JSON")
+    parser.add_argument("--plot", help="сохранить график в файл (.png, .svg) без окна")
+    parser.add_argument("--no-plot", action="store_true", help="не строить график")
+    args = parser.parse_args(argv)
+
+    rows = collect_timings(args.max_rec, args.max_it, args.max_seq, args.seq_points)
+    print_timings(rows)
+    if args.csv:
+        write_csv(rows, args.csv)
+
+    # Окно открывается только если не просили ни файлов, ни --no-plot
+    import_time = None
+    if args.plot:
+        import_time = plot_timings(rows, args.plot)
+    elif not (args.no_plot or args.csv or args.json):
+        import_time = plot_timings(rows)
+
+    if args.json:
+        write_json(rows, args.json, {
+            "module_import_s": MODULE_IMPORT_S,
+            "matplotlib_import_s": import_time,
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,60 @@
 import tkinter as tk
+import threading
 from tkinter import messagebox
-from itertools import product
+from itertools import islice
+
+from lab5 import bounded_partitions, count_distributions, distribution_cache, iter_optimal_distributions
+
+# Сколько оптимальных распределений выводится за одно нажатие "Показать ещё"
+PAGE_SIZE = 20
+
+# Как часто окно забирает прогресс у фонового перебора
+POLL_INTERVAL_MS = 100
+
+# Перебор в фоновом потоке. Поток только обновляет поля под блокировкой,
+# окно само забирает их через root.after, Tk из потока не трогаем.
+class DistributionSearch:
+    def __init__(self, total_items, total_people, min_items=1, max_items=2):
+        self.args = (total_items, total_people, min_items, max_items)
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.examined = 0
+        self.best = None
+        self.done = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        examined = 0
+        best = None
+        # Генератор сразу отбрасывает недопустимые ветки, поэтому каждый
+        # просмотренный шаблон - допустимое распределение
+        for dist in bounded_partitions(*self.args):
+            examined += 1
+            counts = [len(g) for g in dist]
+            rough = max(counts) - min(counts)
+            if best is None or rough < best[1]:
+                best = (dist, rough)
+            if examined % 4096 == 0:
+                with self.lock:
+                    self.examined = examined
+                    self.best = best
+                if self.cancelled.is_set():
+                    break
+        with self.lock:
+            self.examined = examined
+            self.best = best
+            self.done = True
+
+    def snapshot(self):
+        with self.lock:
+            return self.examined, self.best, self.done
 
-#Функция распределения предметов между людьми
-def assign_items_to_people(item_ids, distribution):
-    num_people = max(distribution) + 1
-    people = [[] for _ in range(num_people)]
-    for item_id, person_idx in zip(item_ids, distribution):
-        people[person_idx].append(item_id)
-    return [sorted(group) for group in people]
-
-def find_optimal_distribution(total_items, total_people, min_items=1, max_items=2):
-    all_distributions = set()
-    roughness_list = []
-
-    item_ids = list(range(1, total_items + 1))
-
-    for pattern in product(range(total_people), repeat=total_items):
-        used_people = set(pattern)
-        if len(used_people) < total_people:
-            continue
-
-        dist = assign_items_to_people(item_ids, pattern)
-
-        counts = [len(g) for g in dist]
-        if min(counts) < min_items or max(counts) > max_items:
-            continue
-
-        key = tuple(tuple(group) for group in dist)
-        if key in all_distributions:
-            continue
-        all_distributions.add(key)
-
-        rough = max(counts) - min(counts)
-        roughness_list.append((dist, rough))
-
-    if not roughness_list:
-        return None, 0
-
-    min_rough = min(r[1] for r in roughness_list)
-    best_options = [r for r in roughness_list if r[1] == min_rough]
-
-    return best_options[0], len(all_distributions)
 
 #графический интерфейс
 class ItemDistributionApp:
@@ -73,6 +86,21 @@ class ItemDistributionApp:
                                   command=self.run_calculation, font=("Arial", 12))
         self.run_button.pack(pady=10)
 
+        self.controls_frame = tk.Frame(root)
+        self.controls_frame.pack()
+        self.cancel_button = tk.Button(self.controls_frame, text="Отмена", state=tk.DISABLED,
+                                       command=self.cancel_calculation, font=("Arial", 12))
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.best_button = tk.Button(self.controls_frame, text="Показать лучшее", state=tk.DISABLED,
+                                     command=self.show_best_so_far, font=("Arial", 12))
+        self.best_button.pack(side=tk.LEFT, padx=5)
+        self.more_button = tk.Button(self.controls_frame, text="Показать ещё", state=tk.DISABLED,
+                                     command=self.show_next_page, font=("Arial", 12))
+        self.more_button.pack(side=tk.LEFT, padx=5)
+
+        self.progress_label = tk.Label(root, text="", font=("Arial", 11))
+        self.progress_label.pack()
+
         # Выходной текст
         self.output_frame = tk.Frame(root)
         self.output_frame.pack(pady=10, fill=tk.BOTH, expand=True)
@@ -86,6 +114,10 @@ class ItemDistributionApp:
 
         self.scrollbar.config(command=self.output_text.yview)
 
+        self.search = None
+        self.optimal_pages = None
+        self.shown_optimal = 0
+
     def run_calculation(self):
         try:
             total_items = int(self.items_entry.get())
@@ -101,21 +133,103 @@ class ItemDistributionApp:
             messagebox.showerror("Ошибка ввода", str(e))
             return
 
-        result = find_optimal_distribution(total_items, total_people, min_items, max_items)
+        if self.search is not None:
+            self.search.cancel()
+
+        total_dists, best_rough = count_distributions(total_items, total_people, min_items, max_items)
 
         self.output_text.delete('1.0', tk.END)
+        self.optimal_pages = iter_optimal_distributions(total_items, total_people, min_items, max_items)
+        self.shown_optimal = 0
+        self.more_button.config(state=tk.NORMAL if total_dists else tk.DISABLED)
 
-        if result == (None, 0):
+        if total_dists == 0:
             self.output_text.insert(tk.END, "Не найдено допустимых распределений.\n")
-        else:
-            (best_dist, roughness), total_dists = result
-            output = f"Оптимальное распределение предметов:\n"
-            for i, items in enumerate(best_dist):
+            return
+
+        self.total_dists = total_dists
+        output = f"Всего допустимых распределений: {total_dists}\n"
+        output += f"Минимальная разница в количестве предметов: {best_rough}\n"
+        self.output_text.insert(tk.END, output)
+
+        cached = distribution_cache.get((total_items, total_people, min_items, max_items))
+        if cached is not None:
+            self.progress_label.config(text="Результат взят из кэша")
+            self.show_result(cached[0])
+            return
+
+        self.search = DistributionSearch(total_items, total_people, min_items, max_items)
+        self.search.start()
+        self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.best_button.config(state=tk.NORMAL)
+        self.root.after(POLL_INTERVAL_MS, self.poll_search, self.search)
+
+    def poll_search(self, search):
+        if search is not self.search:
+            return
+        examined, best, done = search.snapshot()
+        rough = "-" if best is None else best[1]
+        self.progress_label.config(
+            text=f"Просмотрено: {examined} из {self.total_dists}, лучшая разница: {rough}")
+        if not done:
+            self.root.after(POLL_INTERVAL_MS, self.poll_search, search)
+            return
+
+        self.run_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.best_button.config(state=tk.DISABLED)
+        if search.cancelled.is_set():
+            self.progress_label.config(text=self.progress_label.cget("text") + " (отменено)")
+        elif best is not None:
+            distribution_cache.put(search.args, (best, examined))
+        self.show_result(best, final=not search.cancelled.is_set())
+
+    def cancel_calculation(self):
+        if self.search is not None:
+            self.search.cancel()
+
+    def show_best_so_far(self):
+        if self.search is not None:
+            _, best, _ = self.search.snapshot()
+            self.show_result(best, final=False)
+
+    def show_next_page(self):
+        # Следующая порция оптимальных распределений берётся из генератора,
+        # весь список никогда не строится
+        if self.optimal_pages is None:
+            return
+        page = list(islice(self.optimal_pages, PAGE_SIZE))
+        if not page:
+            self.output_text.insert(tk.END, "\nБольше оптимальных распределений нет.\n")
+            self.more_button.config(state=tk.DISABLED)
+            self.optimal_pages = None
+            self.output_text.see(tk.END)
+            return
+        output = ""
+        for dist in page:
+            self.shown_optimal += 1
+            output += f"\nОптимальное распределение №{self.shown_optimal}:\n"
+            for i, items in enumerate(dist):
                 output += f"  Человек {i+1}: {items}\n"
-            output += f"\nРазница в количестве предметов: {roughness}\n"
-            output += f"Всего допустимых распределений: {total_dists}\n"
+        self.output_text.insert(tk.END, output)
+        self.output_text.see(tk.END)
+
+    def show_result(self, best, final=True):
+        if best is None:
+            return
+        best_dist, roughness = best
+        title = "Оптимальное распределение" if final else "Лучшее найденное распределение"
+        output = f"\n{title} предметов:\n"
+        for i, items in enumerate(best_dist):
+            output += f"  Человек {i+1}: {items}\n"
+        output += f"\nРазница в количестве предметов: {roughness}\n"
+
+        self.output_text.insert(tk.END, output)
+        self.output_text.see(tk.END)
+
 
-            self.output_text.insert(tk.END, output)
-root = tk.Tk()
-app = ItemDistributionApp(root)
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = ItemDistributionApp(root)
+    root.mainloop()
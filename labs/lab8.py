@@ -1,5 +1,25 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, simpledialog
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import queue
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+# Tk нужен только окну: пакетный режим работает и на сервере без tkinter
+try:
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, simpledialog
+except ImportError:
+    tk = ttk = filedialog = messagebox = simpledialog = None
 
 PALETTE_BG = "#eef3f7"
 PALETTE_CANVAS = "#f9fbfc"
@@ -8,6 +28,28 @@ PALETTE_ACCENT = "#7fc8a9"
 PALETTE_ACCENT_DARK = "#65b698"
 PALETTE_HILITE = "#cfeee3"
 
+# Фоновая загрузка: как часто окно забирает порции и сколько строк за раз.
+# Добавление строки в хранилище стоит до ~4 мкс, поэтому тик занимает не
+# больше ~20 мс; порции потока не больше бюджета тика, иначе одна порция
+# целиком превысит его.
+LOAD_POLL_MS = 30
+LOAD_ROWS_PER_TICK = 5000
+LOAD_CHUNK_ROWS = 1000
+
+# Писать ли рядом с CSV двоичный снимок (<файл>.snapshot) для быстрого
+# повторного открытия; меняется флажком в окне
+SNAPSHOTS_ENABLED = False
+
+# Сколько строк таблицы одновременно существует в Treeview
+VISIBLE_ROWS = 12
+# Файлы до этого размера аналитика считает точно, храня все суммы
+EXACT_ANALYTICS_BYTES = 64 * 1024 * 1024
+# Сколько сегментов диаграммы показывать отдельно; легенда из PIE_TOP_N + 1
+# строк по 26 пикселей помещается на холст высотой 560
+PIE_TOP_N = 15
+PIE_OTHER = "Прочие"
+PIE_OTHER_COLOR = "#cfd8dc"
+
 class Contract:
     def __init__(self, sid: str, htype: str, manager: str, amount: float):
         self.sid = sid
@@ -43,11 +85,1071 @@ class Contract:
         return [self.sid, self.htype, self.manager, f"{self.amount:.2f}"]
 
 
+# Агрегаты по категориям (видам жилья или менеджерам), которые
+# поддерживаются при каждом добавлении, правке и удалении строки: число
+# договоров, сумма, минимум и максимум. Минимум и максимум при удалении
+# крайнего значения пересчитать сразу нельзя, такая категория помечается
+# и пересчитывается одним проходом по колонке при следующем запросе.
+class SegmentStats:
+    def __init__(self):
+        self.counts = []
+        self.sums = []
+        self.mins = []
+        self.maxs = []
+        self.dirty = set()
+
+    def add(self, code, amount):
+        while code >= len(self.counts):
+            self.counts.append(0)
+            self.sums.append(0.0)
+            self.mins.append(math.inf)
+            self.maxs.append(-math.inf)
+        self.counts[code] += 1
+        self.sums[code] += amount
+        if amount < self.mins[code]:
+            self.mins[code] = amount
+        if amount > self.maxs[code]:
+            self.maxs[code] = amount
+
+    def remove(self, code, amount):
+        self.counts[code] -= 1
+        self.sums[code] -= amount
+        if self.counts[code] == 0:
+            self.sums[code] = 0.0
+            self.mins[code], self.maxs[code] = math.inf, -math.inf
+            self.dirty.discard(code)
+        elif amount <= self.mins[code] or amount >= self.maxs[code]:
+            self.dirty.add(code)
+
+    # Все устаревшие мин/макс пересчитываются за один проход по столбцу
+    def refresh(self, codes, amounts):
+        if not self.dirty:
+            return
+        dirty = self.dirty
+        mins, maxs = self.mins, self.maxs
+        for code in dirty:
+            mins[code], maxs[code] = math.inf, -math.inf
+        for code, amount in zip(codes, amounts):
+            if code in dirty:
+                if amount < mins[code]:
+                    mins[code] = amount
+                if amount > maxs[code]:
+                    maxs[code] = amount
+        dirty.clear()
+
+    def summary(self, names):
+        return {names[code]: (cnt, self.sums[code], self.mins[code], self.maxs[code])
+                for code, cnt in enumerate(self.counts) if cnt}
+
+
+# Колоночное хранилище договоров. Суммы лежат в array('d'), id - байтами
+# в одном общем bytearray, вид жилья и менеджер - номерами в таблицах
+# строк (каждое имя хранится один раз),
+# поэтому на строку уходит несколько десятков байт вместо целого объекта
+# со своим __dict__. Наружу строки выдаются лёгкими ContractRow с тем же
+# интерфейсом, что у Contract.
+class ContractStore:
+    def __init__(self, contracts=()):
+        # id i-й строки: sid_data[sid_starts[i]:sid_starts[i] + sid_lengths[i]];
+        # при правке новый id дописывается в конец, старые байты остаются
+        self.sid_data = bytearray()
+        self.sid_starts = array('Q')
+        self.sid_lengths = array('I')
+        self.amounts = array('d')
+        self.type_codes = array('I')
+        self.manager_codes = array('I')
+        # Кроме кода по точному имени - коды по имени в нижнем регистре
+        # (для запросов без учёта регистра)
+        self.types, self.type_index, self.type_lower = [], {}, {}
+        self.managers, self.manager_index, self.manager_lower = [], {}, {}
+        # Постоянный номер строки: не меняется при удалении соседних строк.
+        # Номера растут в порядке хранения, поэтому строка ищется бинпоиском.
+        self.row_ids = array('Q')
+        self.next_row_id = 0
+        self.type_stats = SegmentStats()
+        self.manager_stats = SegmentStats()
+        self.index = ContractIndex(self)
+        self.extend(contracts)
+
+    @staticmethod
+    def _code(name, names, index, lower):
+        code = index.get(name)
+        if code is None:
+            code = len(names)
+            name = sys.intern(name)
+            names.append(name)
+            index[name] = code
+            lower.setdefault(name.lower(), []).append(code)
+        return code
+
+    @staticmethod
+    def lower_index(names):
+        lower = {}
+        for code, name in enumerate(names):
+            lower.setdefault(name.lower(), []).append(code)
+        return lower
+
+    def type_code(self, htype):
+        return self._code(htype, self.types, self.type_index, self.type_lower)
+
+    def manager_code(self, manager):
+        return self._code(manager, self.managers, self.manager_index, self.manager_lower)
+
+    def sid(self, index):
+        start = self.sid_starts[index]
+        return self.sid_data[start:start + self.sid_lengths[index]].decode('utf-8')
+
+    def set_sid(self, index, sid):
+        data = sid.encode('utf-8')
+        self.sid_starts[index] = len(self.sid_data)
+        self.sid_lengths[index] = len(data)
+        self.sid_data += data
+
+    def row_index(self, row_id):
+        index = bisect_left(self.row_ids, row_id)
+        if index < len(self.row_ids) and self.row_ids[index] == row_id:
+            return index
+        return None
+
+    def append(self, c):
+        self.row_ids.append(self.next_row_id)
+        self.next_row_id += 1
+        data = c.sid.encode('utf-8')
+        self.sid_starts.append(len(self.sid_data))
+        self.sid_lengths.append(len(data))
+        self.sid_data += data
+        self.amounts.append(c.amount)
+        type_code = self.type_code(c.htype)
+        manager_code = self.manager_code(c.manager)
+        self.type_codes.append(type_code)
+        self.manager_codes.append(manager_code)
+        self.type_stats.add(type_code, c.amount)
+        self.manager_stats.add(manager_code, c.amount)
+        self.index.stale = True
+
+    # Правки идут через хранилище, чтобы агрегаты не расходились с данными
+    def set_type(self, index, htype):
+        amount = self.amounts[index]
+        self.type_stats.remove(self.type_codes[index], amount)
+        code = self.type_code(htype)
+        self.index.on_type(index, self.type_codes[index], code)
+        self.type_codes[index] = code
+        self.type_stats.add(code, amount)
+
+    def set_manager(self, index, manager):
+        amount = self.amounts[index]
+        self.manager_stats.remove(self.manager_codes[index], amount)
+        code = self.manager_code(manager)
+        self.index.on_manager(index, self.manager_codes[index], code)
+        self.manager_codes[index] = code
+        self.manager_stats.add(code, amount)
+
+    def set_amount(self, index, amount):
+        amount = float(amount)
+        old = self.amounts[index]
+        self.type_stats.remove(self.type_codes[index], old)
+        self.manager_stats.remove(self.manager_codes[index], old)
+        self.amounts[index] = amount
+        self.index.on_amount(index, old, amount)
+        self.type_stats.add(self.type_codes[index], amount)
+        self.manager_stats.add(self.manager_codes[index], amount)
+
+    # Удаление сдвигает колонки (memmove), номера следующих строк уменьшаются на 1
+    def delete(self, index):
+        amount = self.amounts[index]
+        self.type_stats.remove(self.type_codes[index], amount)
+        self.manager_stats.remove(self.manager_codes[index], amount)
+        for column in (self.row_ids, self.sid_starts, self.sid_lengths, self.amounts,
+                       self.type_codes, self.manager_codes):
+            del column[index]
+        self.index.stale = True
+
+    # Пачка правок [(row_id, поле, значение)]: строки ищутся по постоянному
+    # номеру, так что порядок и фильтры в окне на правки не влияют
+    def apply_edits(self, edits):
+        setters = {"sid": self.set_sid, "htype": self.set_type,
+                   "manager": self.set_manager, "amount": self.set_amount}
+        changed = []
+        for row_id, field, value in edits:
+            index = self.row_index(row_id)
+            if index is None:
+                continue
+            setters[field](index, value)
+            changed.append(row_id)
+        return changed
+
+    # Выборка по виду жилья, менеджеру (без учёта регистра) и диапазону сумм
+    def query(self, htype=None, manager=None, amount_min=None, amount_max=None):
+        return self.index.query(htype, manager, amount_min, amount_max)
+
+    def extend(self, contracts):
+        for c in contracts:
+            self.append(c)
+
+    # Независимая копия колонок (массивы копируются целиком, без обхода строк):
+    # по ней снимок пишется в фоне, пока окно меняет оригинал
+    def copy(self):
+        other = ContractStore()
+        for name, _ in SNAPSHOT_COLUMNS:
+            setattr(other, name, getattr(self, name)[:])
+        other.sid_data = bytearray(self.sid_data)
+        other.types, other.type_index = list(self.types), dict(self.type_index)
+        other.managers, other.manager_index = list(self.managers), dict(self.manager_index)
+        other.type_lower = ContractStore.lower_index(other.types)
+        other.manager_lower = ContractStore.lower_index(other.managers)
+        other.next_row_id = self.next_row_id
+        for mine, theirs in ((self.type_stats, other.type_stats), (self.manager_stats, other.manager_stats)):
+            theirs.counts, theirs.sums = list(mine.counts), list(mine.sums)
+            theirs.mins, theirs.maxs = list(mine.mins), list(mine.maxs)
+            theirs.dirty = set(mine.dirty)
+        return other
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.amounts)
+        if not 0 <= index < len(self.amounts):
+            raise IndexError("номер договора вне диапазона")
+        return ContractRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.amounts)):
+            yield ContractRow(self, index)
+
+    def select(self, indices):
+        return StoreView(self, indices)
+
+    # {имя: (число, сумма, минимум, максимум)} за O(число категорий)
+    def totals_by_type(self):
+        self.type_stats.refresh(self.type_codes, self.amounts)
+        return self.type_stats.summary(self.types)
+
+    def totals_by_manager(self):
+        self.manager_stats.refresh(self.manager_codes, self.amounts)
+        return self.manager_stats.summary(self.managers)
+
+    def total_amount(self):
+        return math.fsum(self.amounts)
+
+
+# Индексы для запросов: номера строк по коду вида жилья и менеджера
+# (по возрастанию) и все строки, упорядоченные по сумме. Строятся при
+# первом запросе; правки ячеек переносят одну строку из списка в список,
+# а добавление и удаление строк (номера сдвигаются) помечают индекс
+# устаревшим, и он перестраивается при следующем запросе.
+class ContractIndex:
+    def __init__(self, store):
+        self.store = store
+        self.stale = True
+
+    def rebuild(self):
+        store = self.store
+        self.by_type = [array('I') for _ in store.types]
+        self.by_manager = [array('I') for _ in store.managers]
+        for row, (t, m) in enumerate(zip(store.type_codes, store.manager_codes)):
+            self.by_type[t].append(row)
+            self.by_manager[m].append(row)
+        order = sorted(range(len(store)), key=store.amounts.__getitem__)
+        self.amount_rows = array('I', order)
+        self.amount_keys = array('d', (store.amounts[row] for row in order))
+        self.stale = False
+
+    @staticmethod
+    def _move(postings, row, old, new):
+        while new >= len(postings):
+            postings.append(array('I'))
+        bucket = postings[old]
+        del bucket[bisect_left(bucket, row)]
+        bucket = postings[new]
+        bucket.insert(bisect_left(bucket, row), row)
+
+    def on_type(self, row, old, new):
+        if not self.stale and old != new:
+            self._move(self.by_type, row, old, new)
+
+    def on_manager(self, row, old, new):
+        if not self.stale and old != new:
+            self._move(self.by_manager, row, old, new)
+
+    # Строки с равной суммой идут по возрастанию номера (как после
+    # устойчивой сортировки в rebuild), поэтому строка среди них тоже
+    # ищется бинпоиском
+    def _tie_pos(self, amount, row):
+        lo = bisect_left(self.amount_keys, amount)
+        hi = bisect_right(self.amount_keys, amount, lo)
+        return bisect_left(self.amount_rows, row, lo, hi)
+
+    def on_amount(self, row, old, new):
+        if self.stale:
+            return
+        pos = self._tie_pos(old, row)
+        del self.amount_keys[pos]
+        del self.amount_rows[pos]
+        pos = self._tie_pos(new, row)
+        self.amount_keys.insert(pos, new)
+        self.amount_rows.insert(pos, row)
+
+    @staticmethod
+    def _codes(lower, name):
+        return lower.get(str(name).strip().lower(), ())
+
+    def query(self, htype=None, manager=None, amount_min=None, amount_max=None):
+        store = self.store
+        if not htype and not manager and amount_min is None and amount_max is None:
+            return store.select(range(len(store)))
+        if self.stale:
+            self.rebuild()
+
+        # Кандидаты берутся из самого короткого индекса, остальные условия
+        # проверяются по колонкам. Каждый кандидат - (размер, списки строк,
+        # идут ли строки в порядке хранения).
+        candidates = []
+        type_codes = manager_codes = None
+        if htype:
+            type_codes = set(self._codes(store.type_lower, htype))
+            rows = [self.by_type[c] for c in type_codes]
+            candidates.append((sum(map(len, rows)), rows, len(rows) == 1))
+        if manager:
+            manager_codes = set(self._codes(store.manager_lower, manager))
+            rows = [self.by_manager[c] for c in manager_codes]
+            candidates.append((sum(map(len, rows)), rows, len(rows) == 1))
+        if amount_min is not None or amount_max is not None:
+            lo = 0 if amount_min is None else bisect_left(self.amount_keys, amount_min)
+            hi = len(self.amount_keys) if amount_max is None else bisect_right(self.amount_keys, amount_max)
+            # строки из индекса по сумме идут в порядке сумм
+            candidates.append((max(hi - lo, 0), [self.amount_rows[lo:hi]], False))
+
+        candidates.sort(key=lambda c: c[0])
+        _, rows, ordered = candidates[0]
+        result = array('I')
+        for bucket in rows:
+            for row in bucket:
+                if type_codes is not None and store.type_codes[row] not in type_codes:
+                    continue
+                if manager_codes is not None and store.manager_codes[row] not in manager_codes:
+                    continue
+                amount = store.amounts[row]
+                if amount_min is not None and amount < amount_min:
+                    continue
+                if amount_max is not None and amount > amount_max:
+                    continue
+                result.append(row)
+        # Результат всегда в порядке хранения, из какого индекса ни брали бы строки
+        if not ordered:
+            result = array('I', sorted(result))
+        return store.select(result)
+
+
+class ContractRow:
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def sid(self):
+        return self.store.sid(self.index)
+
+    @sid.setter
+    def sid(self, value):
+        self.store.set_sid(self.index, value)
+
+    @property
+    def htype(self):
+        return self.store.types[self.store.type_codes[self.index]]
+
+    @htype.setter
+    def htype(self, value):
+        self.store.set_type(self.index, value)
+
+    @property
+    def manager(self):
+        return self.store.managers[self.store.manager_codes[self.index]]
+
+    @manager.setter
+    def manager(self, value):
+        self.store.set_manager(self.index, value)
+
+    @property
+    def amount(self):
+        return self.store.amounts[self.index]
+
+    @amount.setter
+    def amount(self, value):
+        self.store.set_amount(self.index, value)
+
+    is_type = Contract.is_type
+    is_manager = Contract.is_manager
+    as_row = Contract.as_row
+
+
+# Часть хранилища в заданном порядке (после сортировки или фильтра):
+# хранит только номера строк
+class StoreView:
+    __slots__ = ('store', 'indices')
+
+    def __init__(self, store, indices):
+        self.store = store
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        return ContractRow(self.store, self.indices[i])
+
+    def __iter__(self):
+        for index in self.indices:
+            yield ContractRow(self.store, index)
+
+
+# Потоковое чтение CSV через стандартный модуль csv (разбор на C).
+# Файл читается построчно, поэтому в памяти только текущая порция;
+# кавычки с переводами строк внутри поля обрабатываются правильно.
+# Выдаёт порции (contracts, bads, bytes_read), где bads - список
+# (номер строки, поля, ошибка), bytes_read - сколько байт файла прочитано.
+# Первая порция может быть меньше остальных, чтобы первые строки
+# появлялись быстрее.
+# Незакрытая кавычка заставляет csv.reader склеивать следующие строки в
+# одно поле, пока оно не превысит csv.field_size_limit() или не кончится
+# файл, и тогда он бросает csv.Error; если же дальше встретится другая
+# кавычка, получится многострочная запись, не проходящая проверку. В обоих
+# случаях плохой считается первая строка записи, а разбор продолжается со
+# следующей: остальные строки отдаются новому reader'у заново.
+def iter_contract_chunks(path, chunk_size=10000, first_chunk=None):
+    goods, bads = [], []
+    bytes_read = 0
+    # last_line - номер последней отданной reader'у строки файла
+    last_line = 0
+    limit = first_chunk or chunk_size
+
+    with open(path, 'rb') as f:
+        # record - тексты строк текущей записи, pushback - строки, которые
+        # нужно прочитать ещё раз (последняя в списке идёт первой)
+        record, pushback = [], []
+
+        def lines():
+            nonlocal bytes_read, last_line
+            while True:
+                while pushback:
+                    text = pushback.pop()
+                    last_line += 1
+                    record.append(text)
+                    yield text
+                raw = f.readline()
+                if not raw:
+                    return
+                bytes_read += len(raw)
+                last_line += 1
+                text = raw.decode('utf-8')
+                record.append(text)
+                yield text
+
+        def resync(error):
+            nonlocal last_line
+            last_line -= len(record)
+            bads.append((last_line + 1, [record[0].rstrip('\r\n')], error))
+            last_line += 1
+            pushback.extend(reversed(record[1:]))
+            record.clear()
+            return csv.reader(lines())
+
+        reader = csv.reader(lines())
+        header_checked = False
+        while reader is not None:
+            current, reader = reader, None
+            try:
+                for row in current:
+                    if not row or (len(row) == 1 and not row[0].strip()):
+                        record.clear()
+                        continue
+                    if not header_checked:
+                        header_checked = True
+                        row[0] = row[0].lstrip('\ufeff')
+                        if row[0].strip().lower() == "id":
+                            record.clear()
+                            continue
+                    try:
+                        goods.append(Contract.from_list(row))
+                    except Exception as e:
+                        if len(record) > 1:
+                            reader = resync(f"незакрытая кавычка: {e}")
+                            break
+                        # last_line - номер последней прочитанной строки файла
+                        bads.append((last_line, row, str(e)))
+                    record.clear()
+                    if len(goods) + len(bads) >= limit:
+                        yield goods, bads, bytes_read
+                        goods, bads = [], []
+                        limit = chunk_size
+            except csv.Error as e:
+                reader = resync(f"ошибка разбора CSV: {e}")
+    if goods or bads:
+        yield goods, bads, bytes_read
+
+
+# Двоичный снимок загруженного CSV рядом с ним (<файл>.snapshot): колонки
+# хранилища как есть, таблицы строк и агрегаты - в JSON-заголовке.
+# Снимок годится, только если у CSV те же размер, mtime и хэш первого и
+# последнего мегабайта (хэш всего файла стоил бы столько же, сколько разбор).
+# Колонки читаются из mmap одним копированием на колонку.
+SNAPSHOT_MAGIC = b"LAB8SNAP"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SAMPLE = 1 << 20
+SNAPSHOT_COLUMNS = [("row_ids", "Q"), ("sid_starts", "Q"), ("sid_lengths", "I"), ("amounts", "d"),
+                    ("type_codes", "I"), ("manager_codes", "I")]
+
+
+def snapshot_path(csv_path):
+    return csv_path + ".snapshot"
+
+
+def csv_fingerprint(csv_path):
+    st = os.stat(csv_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(csv_path, 'rb') as f:
+        digest.update(f.read(SNAPSHOT_SAMPLE))
+        if st.st_size > SNAPSHOT_SAMPLE:
+            f.seek(max(SNAPSHOT_SAMPLE, st.st_size - SNAPSHOT_SAMPLE))
+            digest.update(f.read())
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest.hexdigest()}
+
+
+def save_snapshot(store, bads, csv_path, fingerprint=None):
+    fingerprint = fingerprint or csv_fingerprint(csv_path)
+    store.type_stats.refresh(store.type_codes, store.amounts)
+    store.manager_stats.refresh(store.manager_codes, store.amounts)
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "csv": fingerprint,
+        "rows": len(store),
+        "next_row_id": store.next_row_id,
+        "types": store.types,
+        "managers": store.managers,
+        "stats": [[s.counts, s.sums, s.mins, s.maxs] for s in (store.type_stats, store.manager_stats)],
+        "bads": bads,
+        "columns": [[name, code, len(getattr(store, name)) * array(code).itemsize]
+                    for name, code in SNAPSHOT_COLUMNS] + [["sid_data", "B", len(store.sid_data)]],
+    }
+    data = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    path = snapshot_path(csv_path)
+    # у каждого потока свой временный файл, замена атомарная
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(len(data).to_bytes(8, 'little'))
+        f.write(data)
+        for name, _ in SNAPSHOT_COLUMNS:
+            getattr(store, name).tofile(f)
+        f.write(store.sid_data)
+    os.replace(tmp, path)
+
+
+# Возвращает (store, bads) или None, если снимка нет или CSV изменился
+def load_snapshot(csv_path):
+    path = snapshot_path(csv_path)
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            return None
+        pos = len(SNAPSHOT_MAGIC)
+        size = int.from_bytes(mm[pos:pos + 8], 'little')
+        pos += 8
+        header = json.loads(mm[pos:pos + size].decode('utf-8'))
+        pos += size
+        if header.get("version") != SNAPSHOT_VERSION or header.get("csv") != csv_fingerprint(csv_path):
+            return None
+
+        store = ContractStore()
+        view = memoryview(mm)
+        try:
+            for name, code, nbytes in header["columns"]:
+                if code == "B":
+                    store.sid_data = bytearray(view[pos:pos + nbytes])
+                else:
+                    column = array(code)
+                    column.frombytes(view[pos:pos + nbytes])
+                    setattr(store, name, column)
+                pos += nbytes
+        finally:
+            view.release()
+
+    store.next_row_id = header["next_row_id"]
+    store.types = [sys.intern(t) for t in header["types"]]
+    store.managers = [sys.intern(m) for m in header["managers"]]
+    store.type_index = {t: code for code, t in enumerate(store.types)}
+    store.manager_index = {m: code for code, m in enumerate(store.managers)}
+    store.type_lower = ContractStore.lower_index(store.types)
+    store.manager_lower = ContractStore.lower_index(store.managers)
+    for stats, (counts, sums, mins, maxs) in zip((store.type_stats, store.manager_stats), header["stats"]):
+        stats.counts, stats.sums, stats.mins, stats.maxs = counts, sums, mins, maxs
+    bads = [tuple(b) for b in header["bads"]]
+    return store, bads
+
+
+# Журнал правок рядом с CSV (<файл>.journal): первая строка - отпечаток
+# CSV, к которому относятся правки, дальше по строке JSON на правку
+# {"row": номер, "field": поле, "value": значение} или {"row": номер, "delete": true}.
+# Номер строки - её порядковый номер среди договоров исходного CSV.
+# Запись только дописывается и сразу сбрасывается на диск, поэтому
+# сохранение нескольких правок не зависит от размера файла. Оборванная
+# при сбое последняя строка при чтении просто пропускается.
+def journal_path(csv_path):
+    return csv_path + ".journal"
+
+
+def append_journal(csv_path, entries, fingerprint=None):
+    path = journal_path(csv_path)
+    fingerprint = fingerprint or csv_fingerprint(csv_path)
+    data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode('utf-8')
+    try:
+        f = open(path, 'r+b')
+    except FileNotFoundError:
+        f = open(path, 'w+b')
+    with f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("csv") != fingerprint:
+            # Журнал от другой версии CSV при загрузке всё равно не
+            # применится - начинаем новый, иначе правки допишутся под старый заголовок
+            f.seek(0)
+            f.truncate()
+            f.write((json.dumps({"csv": fingerprint}) + "\n").encode('utf-8'))
+        else:
+            _repair_journal_tail(f)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# После сбоя последняя строка журнала может быть оборвана. Новая запись
+# не должна склеиться с ней: целая строка без перевода строки дополняется
+# им, обрывок отрезается.
+def _repair_journal_tail(f):
+    end = f.seek(0, os.SEEK_END)
+    pos = end
+    tail = b""
+    while pos > 0:
+        step = min(4096, pos)
+        pos -= step
+        f.seek(pos)
+        tail = f.read(step) + tail
+        if b"\n" in tail[:-1] or pos == 0:
+            break
+    if not tail or tail.endswith(b"\n"):
+        return
+    cut = tail.rfind(b"\n") + 1
+    try:
+        json.loads(tail[cut:])
+    except ValueError:
+        f.truncate(end - len(tail) + cut)
+        f.seek(0, os.SEEK_END)
+        return
+    f.write(b"\n")
+
+
+def replay_journal(store, csv_path, fingerprint=None):
+    path = journal_path(csv_path)
+    try:
+        f = open(path, encoding='utf-8')
+    except OSError:
+        return 0
+    applied = 0
+    with f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return 0
+        # Журнал от другой версии CSV не применяется
+        if header.get("csv") != (fingerprint or csv_fingerprint(csv_path)):
+            return 0
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if entry.get("delete"):
+                index = store.row_index(entry["row"])
+                if index is not None:
+                    store.delete(index)
+                    applied += 1
+            else:
+                applied += len(store.apply_edits([(entry["row"], entry["field"], entry["value"])]))
+    return applied
+
+
+# Полная перезапись CSV: во временный файл через csv.writer с большим
+# буфером, fsync и атомарная замена - при сбое остаётся либо старый, либо
+# новый файл целиком. extra_rows - строки как есть (например, не прошедшие
+# проверку), они дописываются в конец.
+def write_csv_atomic(store, path, extra_rows=()):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8', newline='', buffering=1 << 20) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(["id", "type", "manager", "amount"])
+        writer.writerows(c.as_row() for c in store)
+        writer.writerows(extra_rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# Сжатие: журнал вливается в CSV, после чего журнал и снимок удаляются,
+# а строки хранилища получают номера по новому файлу. Строки, не прошедшие
+# проверку при загрузке (bads), в хранилище не попали - они переносятся в
+# конец файла, чтобы сжатие их не потеряло.
+def compact_journal(store, csv_path, bads=()):
+    write_csv_atomic(store, csv_path, [row for _, row, _ in bads])
+    for path in (journal_path(csv_path), snapshot_path(csv_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    store.row_ids = array('Q', range(len(store)))
+    store.next_row_id = len(store)
+
+
+# Загрузка в фоновом потоке: порции складываются в очередь, окно забирает
+# их через root.after. Поток не трогает Tk, только очередь и флаг отмены.
+class ContractLoader:
+    def __init__(self, path, chunk_size=LOAD_CHUNK_ROWS, first_chunk=500):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.first_chunk = first_chunk
+        self.total_bytes = os.path.getsize(path)
+        self.queue = queue.Queue(maxsize=32)
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    # Очередь ограничена, а после отмены её может больше никто не читать:
+    # ждём место понемногу и бросаем сообщение, как только загрузку отменили
+    def put(self, message):
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(self):
+        chunks = iter_contract_chunks(self.path, self.chunk_size, self.first_chunk)
+        try:
+            for chunk in chunks:
+                if not self.put(("chunk", chunk)):
+                    break
+        except Exception as e:
+            self.put(("error", e))
+        finally:
+            # файл закрывается сразу, а не когда сборщик доберётся до генератора
+            chunks.close()
+        self.put(("done", None))
+
+
+# Потоковая аналитика по суммам за один проход с постоянной памятью.
+# Квантили - по логарифмическому скетчу: сумма x попадает в корзину
+# ceil(log(x) / log(gamma)), и любой квантиль восстанавливается с
+# относительной ошибкой не больше alpha. Скетчи складываются корзина к
+# корзине, поэтому итоги разных файлов или процессов можно объединять.
+class QuantileSketch:
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        if x <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(x) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        for key, cnt in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + cnt
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    # Гистограмма из корзин скетча: каждая корзина целиком идёт в тот
+    # равный интервал [min, max], куда попадает её представитель
+    def histogram(self, bins=20):
+        counts = [0] * bins
+        if not self.count:
+            return counts, self.min, self.max
+        width = (self.max - self.min) / bins or 1.0
+        counts[0] += self.zeros
+        for key, cnt in self.buckets.items():
+            value = min(max(self._value(key), self.min), self.max)
+            counts[min(int((value - self.min) / width), bins - 1)] += cnt
+        return counts, self.min, self.max
+
+
+# Менеджеры с наибольшей выручкой: Space-Saving с весами. Отслеживается не
+# больше capacity менеджеров; новый вытесняет самого слабого и наследует
+# его сумму, поэтому оценка сверху, а крупные менеджеры не теряются.
+# Самый слабый находится по куче с ленивым удалением устаревших записей.
+# Пока вытеснений не было (evicted = False), суммы точные; capacity=None -
+# без ограничения, обычный словарь сумм.
+class TopManagers:
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.totals = {}
+        self.heap = []
+        self.evicted = False
+
+    def add(self, manager, amount):
+        if manager in self.totals:
+            self.totals[manager] += amount
+        elif self.capacity is None or len(self.totals) < self.capacity:
+            self.totals[manager] = amount
+        else:
+            self.evicted = True
+            while True:
+                value, victim = heapq.heappop(self.heap)
+                if self.totals.get(victim) == value:
+                    break
+            del self.totals[victim]
+            self.totals[manager] = value + amount
+        if self.capacity is None:
+            return
+        heapq.heappush(self.heap, (self.totals[manager], manager))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(v, m) for m, v in self.totals.items()]
+            heapq.heapify(self.heap)
+
+    def merge(self, other):
+        self.evicted = self.evicted or other.evicted
+        for manager, amount in other.totals.items():
+            self.add(manager, amount)
+
+    def top(self, k=10):
+        return heapq.nlargest(k, self.totals.items(), key=lambda kv: kv[1])
+
+
+class AmountAnalytics:
+    def __init__(self, exact=False, alpha=0.01, capacity=1000):
+        self.sketch = QuantileSketch(alpha)
+        # В точном режиме суммы менеджеров считаются без ограничения, а все
+        # суммы договоров хранятся (array('d'), 8 байт на строку)
+        self.managers = TopManagers(None if exact else capacity)
+        self.total = 0.0
+        self.exact = array('d') if exact else None
+        # Отсортированная копия для перцентилей; сбрасывается при добавлении
+        self.ordered = None
+
+    def add(self, c):
+        self.sketch.add(c.amount)
+        self.managers.add(c.manager, c.amount)
+        self.total += c.amount
+        if self.exact is not None:
+            self.exact.append(c.amount)
+            self.ordered = None
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.managers.merge(other.managers)
+        self.total += other.total
+        if self.exact is not None and other.exact is not None:
+            self.exact.extend(other.exact)
+            self.ordered = None
+
+    def quantile(self, q):
+        if self.exact is not None and len(self.exact):
+            if self.ordered is None:
+                self.ordered = sorted(self.exact)
+            return self.ordered[round(q * (len(self.ordered) - 1))]
+        return self.sketch.quantile(q)
+
+    def histogram(self, bins=20):
+        if self.exact is None or not len(self.exact):
+            return self.sketch.histogram(bins)
+        lo, hi = self.sketch.min, self.sketch.max
+        width = (hi - lo) / bins or 1.0
+        counts = [0] * bins
+        for x in self.exact:
+            counts[min(int((x - lo) / width), bins - 1)] += 1
+        return counts, lo, hi
+
+    def summary(self, quantiles=(0.5, 0.9, 0.95, 0.99), bins=20, k=10):
+        return {
+            "count": self.sketch.count,
+            "total": self.total,
+            "min": self.sketch.min,
+            "max": self.sketch.max,
+            "quantiles": {q: self.quantile(q) for q in quantiles},
+            "histogram": self.histogram(bins),
+            "top_managers": self.managers.top(k),
+            "top_exact": not self.managers.evicted,
+        }
+
+
+def analyze_file(path, exact=False):
+    analytics = AmountAnalytics(exact=exact)
+    bads = 0
+    for goods, bad_rows, _ in iter_contract_chunks(path, chunk_size=50000):
+        for c in goods:
+            analytics.add(c)
+        bads += len(bad_rows)
+    return analytics, bads
+
+
+# Пакетная обработка без окна: каждый файл разбирается в отдельном
+# процессе, процесс возвращает только частичные итоги по видам жилья и
+# менеджерам, итоги складываются в главном процессе.
+# Файл, который не удалось дочитать (не UTF-8, ошибка чтения), в итоги не
+# входит вовсе, а попадает в список failed - остальные файлы обрабатываются.
+def aggregate_file(path):
+    by_type, by_manager = {}, {}
+    rows = bad_rows = 0
+    try:
+        for goods, bads, _ in iter_contract_chunks(path, chunk_size=50000):
+            rows += len(goods)
+            bad_rows += len(bads)
+            for c in goods:
+                t = by_type.setdefault(c.htype, [0, 0.0])
+                t[0] += 1
+                t[1] += c.amount
+                m = by_manager.setdefault(c.manager, [0, 0.0])
+                m[0] += 1
+                m[1] += c.amount
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        return {"files": 1, "rows": 0, "bad_rows": 0, "by_type": {}, "by_manager": {},
+                "failed": [[path, str(e)]]}
+    return {"files": 1, "rows": rows, "bad_rows": bad_rows, "by_type": by_type, "by_manager": by_manager,
+            "failed": []}
+
+
+def merge_aggregates(parts):
+    result = {"files": 0, "rows": 0, "bad_rows": 0, "by_type": {}, "by_manager": {}, "failed": []}
+    for part in parts:
+        for key in ("files", "rows", "bad_rows"):
+            result[key] += part[key]
+        result["failed"].extend(part["failed"])
+        for key in ("by_type", "by_manager"):
+            merged = result[key]
+            for name, (cnt, amount) in part[key].items():
+                acc = merged.setdefault(name, [0, 0.0])
+                acc[0] += cnt
+                acc[1] += amount
+    return result
+
+
+def collect_csv_paths(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith((".csv", ".txt")):
+                    paths.append(os.path.join(item, name))
+        else:
+            paths.append(item)
+    return paths
+
+
+def run_batch(paths, workers=None):
+    if workers == 1 or len(paths) <= 1:
+        return merge_aggregates(map(aggregate_file, paths))
+    # Файлы раздаются по одному: размеры разные, так нагрузка ровнее
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return merge_aggregates(executor.map(aggregate_file, paths))
+
+
+def write_batch_report(result, path):
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["segment", "name", "count", "amount"])
+        for key, segment in (("by_type", "type"), ("by_manager", "manager")):
+            for name, (cnt, amount) in sorted(result[key].items()):
+                writer.writerow([segment, name, cnt, f"{amount:.2f}"])
+        for path, _ in result["failed"]:
+            writer.writerow(["failed", path, "", ""])
+
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog="lab8.py batch",
+                                     description="Итоги по видам жилья и менеджерам для многих CSV без окна")
+    parser.add_argument("inputs", nargs="+", help="CSV-файлы или каталоги с ними")
+    parser.add_argument("-o", "--output", default="-", help="куда записать итоги (.json или .csv, - для вывода)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="число процессов (по умолчанию все ядра)")
+    args = parser.parse_args(argv)
+
+    paths = collect_csv_paths(args.inputs)
+    if not paths:
+        parser.error("не найдено ни одного CSV")
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        parser.error(f"файл не найден: {', '.join(missing)}")
+    start = time.perf_counter()
+    result = run_batch(paths, args.workers)
+    elapsed = time.perf_counter() - start
+    if args.output == "-":
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        write_batch_report(result, args.output)
+    for path, error in result["failed"]:
+        print(f"Не удалось обработать {path}: {error}", file=sys.stderr)
+    print(f"Файлов: {result['files']}, с ошибкой: {len(result['failed'])}, строк: {result['rows']}, "
+          f"пропущено: {result['bad_rows']}, время: {elapsed:.2f} с", file=sys.stderr)
+    # Итоги по остальным файлам записаны, но о сбое должен узнать и планировщик
+    return 1 if result["failed"] else 0
+
+
 class ContractsApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Договоры на продажу жилья")
-        self.contracts = []
+        self.contracts = ContractStore()
+        self.path = None
+        self.fingerprint = None
+        self.pending = []
+        self.loader = None
+        self.pie_items = {}
+        self.pie_slices = None
         self._setup_style()
         self.build_gui()
 
@@ -61,6 +1163,7 @@ class ContractsApp:
 
         style.configure("Calm.TFrame", background=PALETTE_BG)
         style.configure("Calm.TLabel", background=PALETTE_BG, foreground=PALETTE_TEXT, font=("Segoe UI", 10))
+        style.configure("Calm.TCheckbutton", background=PALETTE_BG, foreground=PALETTE_TEXT, font=("Segoe UI", 10))
         style.configure("Calm.TButton",
                         background=PALETTE_ACCENT,
                         foreground="white",
@@ -91,92 +1194,198 @@ class ContractsApp:
 
         ttk.Button(top, text="Загрузить CSV", style="Calm.TButton", command=self.load_csv).grid(row=0, column=0, padx=6)
         ttk.Button(top, text="Сохранить CSV", style="Calm.TButton", command=self.save_csv).grid(row=0, column=1, padx=6)
+        ttk.Button(top, text="Сохранить правки", style="Calm.TButton", command=self.save_changes).grid(
+            row=0, column=4, padx=6)
+        ttk.Button(top, text="Сжать журнал", style="Calm.TButton", command=self.compact_changes).grid(
+            row=0, column=5, padx=6)
         ttk.Button(top, text="Диаграмма по видам жилья", style="Calm.TButton", command=self.show_pie_by_type).grid(
             row=0, column=2, padx=6)
         ttk.Button(top, text="Диаграмма по менеджерам", style="Calm.TButton", command=self.show_pie_by_manager).grid(
             row=0, column=3, padx=6)
 
+        self.progress = ttk.Progressbar(top, orient='horizontal', length=180, mode='determinate', maximum=100)
+        self.progress.grid(row=1, column=0, columnspan=3, padx=6, pady=(8, 0), sticky='we')
+        self.cancel_button = ttk.Button(top, text="Отменить загрузку", style="Calm.TButton",
+                                        command=self.cancel_load, state='disabled')
+        self.cancel_button.grid(row=1, column=3, padx=6, pady=(8, 0))
+        ttk.Button(top, text="Аналитика по суммам", style="Calm.TButton", command=self.analyze_csv).grid(
+            row=1, column=4, padx=6, pady=(8, 0))
+        self.use_snapshots = tk.BooleanVar(value=SNAPSHOTS_ENABLED)
+        ttk.Checkbutton(top, text="Снимки для быстрого открытия", style="Calm.TCheckbutton",
+                        variable=self.use_snapshots).grid(row=1, column=5, padx=6, pady=(8, 0))
+
+        ff = ttk.Frame(self.root, style="Calm.TFrame")
+        ff.pack(padx=14, pady=(0, 8), fill='x')
+        self.filter_entries = {}
+        for col, (key, label) in enumerate([("htype", "Вид:"), ("manager", "Менеджер:"),
+                                            ("amount_min", "Сумма от:"), ("amount_max", "до:")]):
+            ttk.Label(ff, text=label, style="Calm.TLabel").grid(row=0, column=2 * col, padx=(6, 2))
+            entry = ttk.Entry(ff, width=14)
+            entry.grid(row=0, column=2 * col + 1)
+            self.filter_entries[key] = entry
+        ttk.Button(ff, text="Фильтр", style="Calm.TButton", command=self.apply_filter).grid(row=0, column=8, padx=6)
+        ttk.Button(ff, text="Сбросить", style="Calm.TButton", command=self.reset_filter).grid(row=0, column=9)
+
         tf = ttk.Frame(self.root, style="Calm.TFrame")
         tf.pack(padx=14, fill='both')
         self.tree = ttk.Treeview(tf, columns=("ID", "Type", "Manager", "Amount"),
-                                 show='headings', height=12, style="Calm.Treeview")
-        for col, w in [("ID", 120), ("Type", 200), ("Manager", 200), ("Amount", 140)]:
-            self.tree.heading(col, text=col, anchor='center')
+                                 show='headings', height=VISIBLE_ROWS, style="Calm.Treeview")
+        for ci, (col, w) in enumerate([("ID", 120), ("Type", 200), ("Manager", 200), ("Amount", 140)]):
+            self.tree.heading(col, text=col, anchor='center', command=lambda i=ci: self.sort_by(i))
             self.tree.column(col, width=w, anchor='center')
-        sb = ttk.Scrollbar(tf, orient='vertical', command=self.tree.yview)
-        self.tree.configure(yscrollcommand=sb.set)
+        # Полоса прокрутки показывает положение в данных, а не в Treeview:
+        # в самом Treeview всегда не больше VISIBLE_ROWS строк
+        self.scrollbar = ttk.Scrollbar(tf, orient='vertical', command=self.on_scroll)
         self.tree.pack(side='left', fill='both', expand=True)
-        sb.pack(side='left', fill='y', padx=(0, 6))
+        self.scrollbar.pack(side='left', fill='y', padx=(0, 6))
         self.tree.bind('<Double-1>', self.on_double_click)
+        self.tree.bind('<Delete>', self.delete_selected)
+        self.tree.bind('<ButtonPress-1>', self.on_tree_press)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll_rows(-1 if e.delta > 0 else 1) or 'break')
+        self.tree.bind('<Button-4>', lambda e: self.scroll_rows(-1) or 'break')
+        self.tree.bind('<Button-5>', lambda e: self.scroll_rows(1) or 'break')
+        self.tree.bind('<Prior>', lambda e: self.scroll_rows(-VISIBLE_ROWS) or 'break')
+        self.tree.bind('<Next>', lambda e: self.scroll_rows(VISIBLE_ROWS) or 'break')
+        self.view = self.contracts
+        self.top = 0
+        self.sort_key = None
+        self.slots = [self.tree.insert('', 'end', values=("", "", "", "")) for _ in range(VISIBLE_ROWS)]
+        # Какая строка хранилища (постоянный номер) сейчас показана в каждой ячейке окна
+        self.slot_rows = [None] * VISIBLE_ROWS
+        # Выделение хранится постоянными номерами строк, а не ячейками окна:
+        # ячейки переиспользуются при прокрутке и сортировке
+        self.selected_rows = set()
 
         self.canvas = tk.Canvas(self.root, width=900, height=560, bg=PALETTE_CANVAS, highlightthickness=0)
         self.canvas.pack(padx=14, pady=12)
-
-    def parse_csv_line(self, line):
-        line = line.strip()
-        if not line:
-            return []
-
-        fields = []
-        field = ""
-        in_quotes = False
-        i = 0
-
-        while i < len(line):
-            char = line[i]
-
-            if char == '"':
-                if in_quotes and i + 1 < len(line) and line[i + 1] == '"':
-                    field += '"'
-                    i += 1
-                else:
-                    in_quotes = not in_quotes
-            elif char == ',' and not in_quotes:
-                fields.append(field)
-                field = ""
-            else:
-                field += char
-            i += 1
-
-        fields.append(field)
-        return [field.strip('"') for field in fields]
+        self.canvas.bind('<Button-1>', self.on_canvas_click)
 
     def load_csv(self):
         path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt")])
         if not path:
             return
-        goods, bads = [], []
-        try:
-            with open(path, encoding='utf-8') as f:
-                header_checked = False
-                for nr, line in enumerate(f, start=1):
-                    line = line.strip()
-                    if not line:
-                        continue
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+        self.path = None
+        self.pending = []
 
-                    row = self.parse_csv_line(line)
-
-                    if not header_checked:
-                        header_checked = True
-                        if row and row[0].lower() == "id":
-                            continue
+        # Неизменившийся файл открывается из двоичного снимка без разбора
+        snapshot = None
+        if self.use_snapshots.get():
+            try:
+                snapshot = load_snapshot(path)
+            except Exception:
+                snapshot = None
+        if snapshot is not None:
+            self.contracts, self.load_bads = snapshot
+            self.attach_file(path)
+            self.refresh_tree()
+            self.progress['value'] = 100
+            self.report_load()
+            return
 
-                    try:
-                        c = Contract.from_list(row)
-                        goods.append(c)
-                    except Exception as e:
-                        bads.append((nr, row, str(e)))
+        try:
+            self.loader = ContractLoader(path)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка чтения файла: {str(e)}")
             return
 
-        self.contracts = goods
+        self.contracts = ContractStore()
+        self.load_bads = []
         self.refresh_tree()
-        if bads:
-            messagebox.showwarning("Готово", f"Загружено: {len(goods)}, Пропущено строк: {len(bads)}")
+        self.progress['value'] = 0
+        self.cancel_button.state(['!disabled'])
+        self.loader.start()
+        self.root.after(LOAD_POLL_MS, self.drain_loader, self.loader)
+
+    def drain_loader(self, loader):
+        if loader is not self.loader:
+            return
+        # После отмены поток сообщений больше не шлёт, загрузка завершается здесь
+        if loader.cancelled.is_set():
+            self.finish_load(loader)
+            self.render_rows()
+            self.report_load(cancelled=True)
+            return
+        # За один тик забирается не больше LOAD_ROWS_PER_TICK строк, чтобы
+        # окно успевало перерисовываться и реагировать на кнопки
+        taken = 0
+        while taken < LOAD_ROWS_PER_TICK:
+            try:
+                kind, payload = loader.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "chunk":
+                goods, bads, bytes_read = payload
+                self.contracts.extend(goods)
+                self.load_bads.extend(bads)
+                taken += len(goods)
+                if loader.total_bytes:
+                    self.progress['value'] = 100 * bytes_read / loader.total_bytes
+            elif kind == "error":
+                self.finish_load(loader)
+                messagebox.showerror("Ошибка", f"Ошибка чтения файла: {str(payload)}")
+                return
+            else:
+                self.finish_load(loader)
+                if not loader.cancelled.is_set():
+                    # Правки во время загрузки запрещены, поэтому хранилище
+                    # сейчас - ровно разобранный CSV; копия снимается до
+                    # применения журнала и пишется в фоне
+                    parsed = self.contracts.copy() if self.use_snapshots.get() else None
+                    self.attach_file(loader.path)
+                    if parsed is not None:
+                        threading.Thread(target=self.write_snapshot, daemon=True,
+                                         args=(parsed, list(self.load_bads), loader.path, self.fingerprint)).start()
+                self.render_rows()
+                self.report_load(cancelled=loader.cancelled.is_set())
+                return
+        if taken:
+            self.render_rows()
+        # Бюджет выбран, а в очереди ещё есть порции - следующий тик сразу
+        # после обработки событий окна, без ожидания LOAD_POLL_MS
+        delay = 1 if taken >= LOAD_ROWS_PER_TICK else LOAD_POLL_MS
+        self.root.after(delay, self.drain_loader, loader)
+
+    @staticmethod
+    def write_snapshot(store, bads, path, fingerprint):
+        try:
+            save_snapshot(store, bads, path, fingerprint)
+        except OSError:
+            pass
+
+    def finish_load(self, loader):
+        self.loader = None
+        self.cancel_button.state(['disabled'])
+        if not loader.cancelled.is_set():
+            self.progress['value'] = 100
+
+    def cancel_load(self):
+        if self.loader is not None:
+            self.loader.cancel()
+
+    def report_load(self, cancelled=False):
+        goods, bads = self.contracts, self.load_bads
+        if cancelled:
+            messagebox.showinfo("Отменено", f"Загрузка прервана, загружено {len(goods)} записей")
+        elif bads:
+            details = "\n".join(f"строка {nr}: {err}" for nr, _, err in bads[:10])
+            if len(bads) > 10:
+                details += "\n..."
+            messagebox.showwarning("Готово", f"Загружено: {len(goods)}, Пропущено строк: {len(bads)}\n\n{details}")
         else:
             messagebox.showinfo("Готово", f"Успешно загружено {len(goods)} записей")
 
+    # Файл загружен целиком: правки из его журнала применяются поверх
+    # (снимок к этому моменту уже записан без них), новые копятся в pending
+    def attach_file(self, path):
+        self.path = path
+        self.fingerprint = csv_fingerprint(path)
+        self.pending = []
+        replay_journal(self.contracts, path, self.fingerprint)
+
     def save_csv(self):
         path = filedialog.asksaveasfilename(defaultextension=".csv",
                                             filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt")])
@@ -184,104 +1393,439 @@ class ContractsApp:
             return
 
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write("id,type,manager,amount\n")
-                for c in self.contracts:
-                    row = []
-                    for field in [c.sid, c.htype, c.manager, f"{c.amount:.2f}"]:
-                        if ',' in field or '"' in field:
-                            field = field.replace('"', '""')
-                            field = f'"{field}"'
-                        row.append(field)
-                    f.write(','.join(row) + '\n')
+            if self.path and os.path.abspath(path) == os.path.abspath(self.path):
+                compact_journal(self.contracts, path, self.load_bads)
+                self.fingerprint = csv_fingerprint(path)
+                self.pending = []
+                # номера строк после сжатия другие, выделение по ним устарело
+                self.selected_rows.clear()
+                self.render_rows()
+            else:
+                write_csv_atomic(self.contracts, path)
             messagebox.showinfo("Готово", "Файл успешно сохранён.")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка сохранения: {str(e)}")
 
+    # Быстрое сохранение: в журнал дописываются только новые правки
+    def save_changes(self):
+        if not self.path:
+            self.save_csv()
+            return
+        if not self.pending:
+            messagebox.showinfo("Готово", "Несохранённых правок нет.")
+            return
+        try:
+            append_journal(self.path, self.pending, self.fingerprint)
+            messagebox.showinfo("Готово", f"Сохранено правок: {len(self.pending)}")
+            self.pending = []
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Ошибка сохранения: {str(e)}")
+
+    def compact_changes(self):
+        if not self.path:
+            return
+        try:
+            if self.pending:
+                append_journal(self.path, self.pending, self.fingerprint)
+                self.pending = []
+            compact_journal(self.contracts, self.path, self.load_bads)
+            self.fingerprint = csv_fingerprint(self.path)
+            # номера строк после сжатия другие, выделение по ним устарело
+            self.selected_rows.clear()
+            self.render_rows()
+            messagebox.showinfo("Готово", "Журнал влит в файл.")
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Ошибка сохранения: {str(e)}")
+
+    # Виртуальная таблица: self.view - строки, которые сейчас показываются
+    # (все договоры или отфильтрованные), self.top - номер первой видимой.
+    # В Treeview живут только VISIBLE_ROWS строк, у которых меняются значения,
+    # поэтому прокрутка и перерисовка не зависят от размера данных.
     def refresh_tree(self, data=None):
-        data = self.contracts if data is None else data
-        self.tree.delete(*self.tree.get_children())
-        for c in data:
-            self.tree.insert('', 'end', values=(c.sid, c.htype, c.manager, f"{c.amount:,.0f}"))
+        self.view = self.contracts if data is None else data
+        self.sort_key = None
+        self.top = 0
+        self.selected_rows.clear()
+        self.render_rows()
+
+    def render_rows(self):
+        total = len(self.view)
+        self.top = max(0, min(self.top, total - VISIBLE_ROWS))
+        for slot in range(VISIBLE_ROWS):
+            idx = self.top + slot
+            c = self.view[idx] if idx < total else None
+            self.slot_rows[slot] = None if c is None else self.contracts.row_ids[c.index]
+            self.render_slot(slot, c)
+        self.tree.selection_set([item for item, row_id in zip(self.slots, self.slot_rows)
+                                 if row_id in self.selected_rows])
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + VISIBLE_ROWS) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def render_slot(self, slot, c):
+        if c is None:
+            self.tree.item(self.slots[slot], values=("", "", "", ""))
+        else:
+            self.tree.item(self.slots[slot], values=(c.sid, c.htype, c.manager, f"{c.amount:,.0f}"))
+
+    # После правки перерисовываются только ячейки окна с изменёнными строками
+    def render_changed(self, row_ids):
+        row_ids = set(row_ids)
+        for slot, row_id in enumerate(self.slot_rows):
+            if row_id in row_ids:
+                index = self.contracts.row_index(row_id)
+                self.render_slot(slot, None if index is None else self.contracts[index])
+
+    # Щелчок без Shift/Ctrl начинает новое выделение, в том числе снимает
+    # его со строк, которые сейчас прокручены за пределы окна
+    def on_tree_press(self, event):
+        if not event.state & 0x0005:
+            self.selected_rows.clear()
+
+    def on_select(self, event=None):
+        selection = set(self.tree.selection())
+        for item, row_id in zip(self.slots, self.slot_rows):
+            if row_id is None:
+                continue
+            if item in selection:
+                self.selected_rows.add(row_id)
+            else:
+                self.selected_rows.discard(row_id)
+
+    def scroll_rows(self, delta):
+        self.top += delta
+        self.render_rows()
+
+    def on_scroll(self, action, value, unit=None):
+        if action == 'moveto':
+            self.top = int(float(value) * len(self.view))
+        elif action == 'scroll':
+            step = VISIBLE_ROWS if unit == 'pages' else 1
+            self.top += int(value) * step
+        self.render_rows()
+
+    def sort_by(self, ci):
+        # Сортируются номера строк по значениям колонок, сами строки не создаются
+        store = self.contracts
+        if ci == 0:
+            key = store.sid
+        elif ci == 1:
+            lowered = [t.lower() for t in store.types]
+            key = lambda i: lowered[store.type_codes[i]]
+        elif ci == 2:
+            lowered = [m.lower() for m in store.managers]
+            key = lambda i: lowered[store.manager_codes[i]]
+        else:
+            key = store.amounts.__getitem__
+        reverse = self.sort_key == (ci, False)
+        indices = self.view.indices if isinstance(self.view, StoreView) else range(len(store))
+        self.view = store.select(array('I', sorted(indices, key=key, reverse=reverse)))
+        self.sort_key = (ci, reverse)
+        self.top = 0
+        self.render_rows()
+
+    def row_contract(self, item):
+        row_id = self.slot_rows[self.slots.index(item)]
+        index = None if row_id is None else self.contracts.row_index(row_id)
+        return None if index is None else self.contracts[index]
+
+    # Пока файл грузится, правки запрещены: журнал подключается только в
+    # конце загрузки (attach_file), и правки, сделанные раньше, потерялись
+    # бы или были бы перезаписаны старыми записями журнала
+    def loading_blocks_edit(self):
+        if self.loader is None:
+            return False
+        messagebox.showinfo("Загрузка", "Правка доступна после окончания загрузки файла.")
+        return True
 
     def on_double_click(self, event):
+        if self.loading_blocks_edit():
+            return
         item = self.tree.identify_row(event.y)
         col = self.tree.identify_column(event.x)
         if not item or not col:
             return
-        idx = self.tree.index(item)
         ci = int(col.replace('#', '')) - 1
-        c = self.contracts[idx]
-        old = self.tree.item(item, 'values')[ci]
+        c = self.row_contract(item)
+        if c is None:
+            return
+        # Если выделено несколько строк и щелчок по одной из них,
+        # новое значение записывается во все выделенные
+        row_id = self.slot_rows[self.slots.index(item)]
+        row_ids = sorted(self.selected_rows) if row_id in self.selected_rows else [row_id]
+        field, value = None, None
         if ci == 1:
             new = simpledialog.askstring("Тип жилья", "Новый тип:", initialvalue=c.htype)
             if new:
-                c.htype = new.strip()
+                field, value = "htype", new.strip()
         elif ci == 2:
             new = simpledialog.askstring("Менеджер", "Новое имя:", initialvalue=c.manager)
             if new:
-                c.manager = new.strip()
+                field, value = "manager", new.strip()
         elif ci == 3:
             new = simpledialog.askfloat("Сумма", "Новая сумма:", initialvalue=float(c.amount))
             if new is not None and new >= 0:
-                c.amount = float(new)
+                field, value = "amount", float(new)
         else:
             new = simpledialog.askstring("ID", "Новый ID:", initialvalue=c.sid)
             if new:
-                c.sid = new.strip()
+                field, value = "sid", new.strip()
+        if field is None:
+            return
+        changed = self.contracts.apply_edits([(row_id, field, value) for row_id in row_ids])
+        self.pending.extend({"row": row_id, "field": field, "value": value} for row_id in changed)
+        self.render_changed(changed)
+
+    def apply_filter(self):
+        values = {key: entry.get().strip() for key, entry in self.filter_entries.items()}
+        try:
+            amount_min = float(values["amount_min"]) if values["amount_min"] else None
+            amount_max = float(values["amount_max"]) if values["amount_max"] else None
+        except ValueError:
+            messagebox.showerror("Ошибка", "Сумма должна быть числом")
+            return
+        self.refresh_tree(self.contracts.query(values["htype"] or None, values["manager"] or None,
+                                               amount_min, amount_max))
+
+    def reset_filter(self):
+        for entry in self.filter_entries.values():
+            entry.delete(0, tk.END)
         self.refresh_tree()
 
     def segment_by_type(self):
-        stats = {}
-        for c in self.contracts:
-            stats[c.htype] = stats.get(c.htype, 0) + 1
-        return stats
+        return {name: cnt for name, (cnt, *_) in self.contracts.totals_by_type().items()}
 
     def segment_by_manager(self):
-        stats = {}
-        for c in self.contracts:
-            stats[c.manager] = stats.get(c.manager, 0) + 1
-        return stats
+        return {name: cnt for name, (cnt, *_) in self.contracts.totals_by_manager().items()}
+
+    def delete_selected(self, event=None):
+        if self.loading_blocks_edit():
+            return
+        indices = [self.contracts.row_index(row_id) for row_id in self.selected_rows]
+        indices = sorted({index for index in indices if index is not None}, reverse=True)
+        self.selected_rows.clear()
+        if not indices:
+            return
+        for index in indices:
+            self.pending.append({"row": self.contracts.row_ids[index], "delete": True})
+            self.contracts.delete(index)
+        if isinstance(self.view, StoreView):
+            # номера в представлении сдвигаются на число удалённых перед ними
+            removed = sorted(indices)
+            kept = array('I')
+            for index in self.view.indices:
+                shift = bisect_left(removed, index)
+                if shift < len(removed) and removed[shift] == index:
+                    continue
+                kept.append(index - shift)
+            self.view = self.contracts.select(kept)
+        self.render_rows()
+
+    # Диаграмма показывает PIE_TOP_N крупнейших сегментов, остальные
+    # сливаются в "Прочие", поэтому число элементов на холсте не зависит от
+    # числа менеджеров. Элементы создаются один раз и при перерисовке только
+    # меняют координаты и текст; лишние прячутся.
+    def _pie_pool(self, kind, count, create):
+        pool = self.pie_items.setdefault(kind, [])
+        while len(pool) < count:
+            pool.append(create())
+        for item in pool[count:]:
+            self.canvas.itemconfigure(item, state='hidden')
+        return pool[:count]
 
-    def show_pie(self, counts: dict, title: str):
-        self.canvas.delete('all')
+    def clear_canvas(self):
+        self.canvas.delete('analytics')
+        self.canvas.itemconfigure('pie', state='hidden')
+        self.pie_slices = None
+
+    def show_pie(self, counts: dict, title: str, stats: dict = None):
+        self.clear_canvas()
         total = sum(counts.values())
         if total == 0:
             self.canvas.create_text(450, 280, text="Нет данных для отображения",
-                                    font=("Segoe UI", 14), fill=PALETTE_TEXT)
+                                    font=("Segoe UI", 14), fill=PALETTE_TEXT, tags='analytics')
             return
 
         cx, cy = 450, 280
         r = 220
-        self.canvas.create_text(cx, 40, text=title, font=("Segoe UI", 16, "bold"), fill=PALETTE_TEXT)
-        palette = ["#81c784", "#64b5f6", "#e57373", "#ffd54f", "#ba68c8", "#4db6ac", "#ff8a65"]
+        if len(counts) > PIE_TOP_N + 1:
+            items = heapq.nsmallest(PIE_TOP_N, counts.items(), key=lambda kv: (-kv[1], kv[0]))
+            shown = {label for label, _ in items}
+            rest = [label for label in counts if label not in shown]
+            items.append((PIE_OTHER, total - sum(cnt for _, cnt in items)))
+        else:
+            items = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+            rest = []
+
+        header = self._pie_pool('header', 2, lambda: self.canvas.create_text(
+            0, 0, fill=PALETTE_TEXT, tags='pie'))
+        self.canvas.coords(header[0], cx, 40)
+        self.canvas.itemconfigure(header[0], text=title, font=("Segoe UI", 16, "bold"), state='normal')
+        if stats:
+            amount = sum(v[1] for v in stats.values())
+            lo = min(v[2] for v in stats.values())
+            hi = max(v[3] for v in stats.values())
+            self.canvas.coords(header[1], cx, 66)
+            self.canvas.itemconfigure(header[1], text=f"Договоров: {total}, сумма: {amount:,.0f}, "
+                                                      f"мин: {lo:,.0f}, макс: {hi:,.0f}",
+                                      font=("Segoe UI", 11), state='normal')
+
+        def describe(label, cnt):
+            text = f"{label}: {cnt} ({cnt / total * 100:.1f}%)"
+            if label == PIE_OTHER:
+                text += f"\nСегментов: {len(rest)}"
+                parts = [stats[name] for name in rest if stats and name in stats]
+                if parts:
+                    text += (f"\nСумма: {sum(p[1] for p in parts):,.0f}"
+                             f"\nМин: {min(p[2] for p in parts):,.0f}\nМакс: {max(p[3] for p in parts):,.0f}")
+            elif stats and label in stats:
+                _, amount, lo, hi = stats[label]
+                text += f"\nСумма: {amount:,.0f}\nМин: {lo:,.0f}\nМакс: {hi:,.0f}"
+            return text
+
+        palette = ["#81c784", "#64b5f6", "#e57373", "#ffd54f", "#ba68c8", "#4db6ac", "#ff8a65",
+                   "#90a4ae", "#aed581", "#f06292"]
+        arcs = self._pie_pool('arcs', len(items), lambda: self.canvas.create_arc(
+            0, 0, 0, 0, outline=PALETTE_CANVAS, width=2, tags='pie'))
+        swatches = self._pie_pool('swatches', len(items), lambda: self.canvas.create_rectangle(
+            0, 0, 0, 0, outline='#dde7ec', tags='pie'))
+        labels = self._pie_pool('labels', len(items), lambda: self.canvas.create_text(
+            0, 0, anchor='w', font=("Segoe UI", 11), fill=PALETTE_TEXT, tags='pie'))
+
+        # Начала секторов по возрастанию угла - по ним клик находит сектор
+        starts = []
         start = 0
-        items = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        lx, ly = cx + r + 30, cy - r
         for i, (label, cnt) in enumerate(items):
+            color = PIE_OTHER_COLOR if label == PIE_OTHER else palette[i % len(palette)]
             extent = 360 * cnt / total
-            arc = self.canvas.create_arc(cx - r, cy - r, cx + r, cy + r,
-                                         start=start, extent=extent,
-                                         fill=palette[i % len(palette)],
-                                         outline=PALETTE_CANVAS, width=2)
-            self.canvas.tag_bind(arc, '<Button-1>',
-                                 lambda e, l=label, c=cnt: messagebox.showinfo('Сегмент',
-                                                                               f"{l}: {c} ({c / total * 100:.1f}%)"))
+            starts.append(start)
+            self.canvas.coords(arcs[i], cx - r, cy - r, cx + r, cy + r)
+            self.canvas.itemconfigure(arcs[i], start=start, extent=extent, fill=color, state='normal')
             start += extent
-        lx, ly = cx + r + 30, cy - r
-        for i, (label, cnt) in enumerate(items):
+
             y = ly + i * 26
-            self.canvas.create_rectangle(lx, y, lx + 18, y + 14,
-                                         fill=palette[i % len(palette)], outline='#dde7ec')
-            self.canvas.create_text(lx + 24, y + 7, text=f"{label}: {cnt} ({cnt / total * 100:.1f}%)",
-                                    anchor='w', font=("Segoe UI", 11), fill=PALETTE_TEXT)
+            name = label if len(label) <= 20 else label[:19] + "…"
+            self.canvas.coords(swatches[i], lx, y, lx + 18, y + 14)
+            self.canvas.itemconfigure(swatches[i], fill=color, state='normal')
+            self.canvas.coords(labels[i], lx + 24, y + 7)
+            self.canvas.itemconfigure(labels[i], text=f"{name}: {cnt} ({cnt / total * 100:.1f}%)",
+                                      state='normal')
+        self.pie_slices = (cx, cy, r, starts, items, describe)
+
+    # Один обработчик на весь холст: угол точки клика ищется среди начал секторов
+    def on_canvas_click(self, event):
+        if not self.pie_slices:
+            return
+        cx, cy, r, starts, items, describe = self.pie_slices
+        dx, dy = event.x - cx, cy - event.y
+        if dx * dx + dy * dy > r * r:
+            return
+        angle = math.degrees(math.atan2(dy, dx)) % 360
+        label, cnt = items[bisect_right(starts, angle) - 1]
+        messagebox.showinfo('Сегмент', describe(label, cnt))
+
+    # Аналитика идёт по файлу на диске, а не по загруженной таблице, поэтому
+    # подходит для файлов, которые в память не помещаются. Небольшие файлы
+    # считаются точно, остальные - через скетч.
+    def analyze_csv(self):
+        path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+        exact = os.path.getsize(path) <= EXACT_ANALYTICS_BYTES
+        result = {}
+
+        def work():
+            try:
+                result["value"] = analyze_file(path, exact=exact)
+            # Любая ошибка потока должна дойти до poll_analytics, иначе
+            # холст так и останется с надписью «Анализ ...»
+            except Exception as e:
+                result["error"] = e
+
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        self.clear_canvas()
+        self.canvas.create_text(450, 280, text=f"Анализ {os.path.basename(path)}...",
+                                font=("Segoe UI", 14), fill=PALETTE_TEXT, tags='analytics')
+        self.root.after(LOAD_POLL_MS, self.poll_analytics, worker, result, path)
+
+    def poll_analytics(self, worker, result, path):
+        if worker.is_alive():
+            self.root.after(LOAD_POLL_MS, self.poll_analytics, worker, result, path)
+            return
+        if "error" in result:
+            self.clear_canvas()
+            messagebox.showerror("Ошибка", f"Не удалось проанализировать файл: {result['error']}")
+            return
+        analytics, bads = result["value"]
+        self.show_analytics(analytics.summary(), f"Суммы договоров: {os.path.basename(path)}",
+                            exact=analytics.exact is not None, bads=bads)
+
+    def show_analytics(self, summary: dict, title: str, exact=False, bads=0):
+        self.clear_canvas()
+        if not summary["count"]:
+            self.canvas.create_text(450, 280, text="Нет данных для отображения",
+                                    font=("Segoe UI", 14), fill=PALETTE_TEXT, tags='analytics')
+            return
+        self.canvas.create_text(450, 30, text=title, font=("Segoe UI", 16, "bold"), fill=PALETTE_TEXT,
+                                tags='analytics')
+        mode = "точно" if exact else "перцентили и гистограмма - оценка скетчем, ошибка до 1%"
+        self.canvas.create_text(450, 56, text=f"Договоров: {summary['count']}, сумма: {summary['total']:,.0f}, "
+                                              f"ошибок: {bads} ({mode})",
+                                font=("Segoe UI", 11), fill=PALETTE_TEXT, tags='analytics')
+
+        # Гистограмма слева
+        counts, lo, hi = summary["histogram"]
+        x0, y0, w, h = 40, 110, 520, 340
+        peak = max(counts) or 1
+        bar = w / len(counts)
+        for i, cnt in enumerate(counts):
+            bh = h * cnt / peak
+            self.canvas.create_rectangle(x0 + i * bar + 1, y0 + h - bh, x0 + (i + 1) * bar - 1, y0 + h,
+                                         fill="#64b5f6", outline='', tags='analytics')
+        self.canvas.create_line(x0, y0 + h, x0 + w, y0 + h, fill=PALETTE_TEXT, tags='analytics')
+        self.canvas.create_text(x0, y0 + h + 14, text=f"{lo:,.0f}", anchor='w',
+                                font=("Segoe UI", 10), fill=PALETTE_TEXT, tags='analytics')
+        self.canvas.create_text(x0 + w, y0 + h + 14, text=f"{hi:,.0f}", anchor='e',
+                                font=("Segoe UI", 10), fill=PALETTE_TEXT, tags='analytics')
+
+        # Квантили и лучшие менеджеры справа
+        lx, y = 600, 110
+        self.canvas.create_text(lx, y, text="Перцентили", anchor='w',
+                                font=("Segoe UI", 12, "bold"), fill=PALETTE_TEXT, tags='analytics')
+        for q, value in summary["quantiles"].items():
+            y += 22
+            self.canvas.create_text(lx, y, text=f"p{q * 100:g}: {value:,.0f}", anchor='w',
+                                    font=("Segoe UI", 11), fill=PALETTE_TEXT, tags='analytics')
+        y += 36
+        self.canvas.create_text(lx, y, text="Менеджеры по выручке", anchor='w',
+                                font=("Segoe UI", 12, "bold"), fill=PALETTE_TEXT, tags='analytics')
+        if not summary["top_exact"]:
+            # Менеджеров больше, чем отслеживает TopManagers: суммы завышены
+            y += 20
+            self.canvas.create_text(lx, y, text="(оценка сверху)", anchor='w',
+                                    font=("Segoe UI", 10), fill=PALETTE_TEXT, tags='analytics')
+        for manager, amount in summary["top_managers"]:
+            y += 22
+            self.canvas.create_text(lx, y, text=f"{manager}: {amount:,.0f}", anchor='w',
+                                    font=("Segoe UI", 11), fill=PALETTE_TEXT, tags='analytics')
 
     def show_pie_by_type(self):
-        self.show_pie(self.segment_by_type(), "Сегментация по видам жилья")
+        stats = self.contracts.totals_by_type()
+        self.show_pie({name: v[0] for name, v in stats.items()}, "Сегментация по видам жилья", stats)
 
     def show_pie_by_manager(self):
-        self.show_pie(self.segment_by_manager(), "Сегментация по менеджерам")
+        stats = self.contracts.totals_by_manager()
+        self.show_pie({name: v[0] for name, v in stats.items()}, "Сегментация по менеджерам", stats)
 
 if __name__ == "__main__":
+    # python lab8.py batch <файлы или каталоги> - пакетный режим без окна
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(batch_main(sys.argv[2:]))
+    if tk is None:
+        sys.exit("Для окна нужен tkinter; без него доступен только режим batch")
     root = tk.Tk()
     app = ContractsApp(root)
     root.mainloop()
\ No newline at end of file